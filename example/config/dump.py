@@ -18,6 +18,5 @@ def dump(obj, name):
 
 def load(name):
     filename = "%s/%s.pkl" % (DUMP_DIR, name)
-    fopen = gzip.open(filename, "rb") if zipped(filename) else open(filename, "rb")
-    with fopen as f:
-        return pickle.load(f)
+    # detects zipped files itself, the file is only opened once
+    return tk.load_file(filename)
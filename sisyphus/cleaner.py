@@ -17,8 +17,11 @@ Useful examples::
 import logging
 import os
 import shutil
+import stat
+import subprocess
 import sys
-import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 
 from typing import Dict, List, Optional, Set, Union
 
@@ -34,6 +37,9 @@ JOB_NOT_FINSIHED = -3
 JOB_STILL_NEEDED = -2
 JOB_WITHOUT_KEEP_VALUE = -1
 
+# Used to delete directories, None if not available
+_RM_COMMAND = shutil.which("rm") if os.name == "posix" else None
+
 
 def extract_keep_values_from_graph() -> Dict[str, int]:
     """Go through loaded graph and create dict with all jobs and keep values
@@ -45,19 +51,26 @@ def extract_keep_values_from_graph() -> Dict[str, int]:
     # and a set containing all jobs which should not be deleted yet since they are needed to compute
     # the output of unfinished jobs or belong to the output. Recheck targets until no new targets are added
     needed = set()
-    last_targets = None
+    # targets and creators are only processed once, the visited dict is shared to reuse already computed subgraphs
+    processed_targets = set()
+    processed_creators = set()
+    needed_visited = {}
 
     sis_graph = graph.graph
-    current_targets = sis_graph.targets.copy()
-    while last_targets != current_targets:
-        for target in sis_graph.targets.copy():
+    last_targets_version = None
+    while last_targets_version != sis_graph.targets_version:
+        last_targets_version = sis_graph.targets_version
+        # copy new targets since processing them can add further targets to the graph
+        new_targets = [target for target in sis_graph.targets if target not in processed_targets]
+        for target in new_targets:
+            processed_targets.add(target)
             for path in target.required:
                 active_paths[os.path.abspath(os.path.join(path.get_path()))] = path
-                if path.creator is not None:
-                    needed.update(path.creator._sis_get_needed_jobs({}))
-                    active_paths.update(path.creator._sis_get_all_inputs())
-        last_targets = current_targets
-        current_targets = sis_graph.targets.copy()
+                creator = path.creator
+                if creator is not None and creator not in processed_creators:
+                    processed_creators.add(creator)
+                    needed.update(creator._sis_get_needed_jobs(needed_visited))
+                    active_paths.update(creator._sis_get_all_inputs())
 
     needed = {job._sis_path() for job in needed}
 
@@ -76,14 +89,23 @@ def extract_keep_values_from_graph() -> Dict[str, int]:
                 if status is None:
                     status = JOB_WITHOUT_KEEP_VALUE
             job_dirs[path] = status
-            path_parts = os.path.split(path)[0]
-            while path_parts:
-                if path_parts not in job_dirs:
-                    job_dirs[path_parts] = DIR_IN_GRAPH
-                path_parts = os.path.split(path_parts)[0]
+            _add_parent_dirs(job_dirs, path)
     return job_dirs
 
 
+def _add_parent_dirs(job_dirs: Dict[str, int], path: str):
+    """Mark all parent directories of path as DIR_IN_GRAPH. Stops at the first known parent since all its parents
+    have been added together with it.
+
+    :param job_dirs: dict with all used directories
+    :param path: path of a job directory
+    """
+    parent = os.path.dirname(path)
+    while parent and parent not in job_dirs:
+        job_dirs[parent] = DIR_IN_GRAPH
+        parent = os.path.dirname(parent)
+
+
 def find_too_low_keep_value(
     job_dirs: Union[str, Dict[Union[str, Path], int]],
     min_keep_value: int,
@@ -120,10 +142,7 @@ def list_all_graph_directories() -> Dict[str, int]:
     for job in graph.graph.jobs():
         path = job._sis_path()
         job_dirs[path] = JOB_STILL_NEEDED
-        path_parts = os.path.split(path)[0]
-        while path_parts:
-            job_dirs[path_parts] = DIR_IN_GRAPH
-            path_parts = os.path.split(path_parts)[0]
+        _add_parent_dirs(job_dirs, path)
     return job_dirs
 
 
@@ -202,16 +221,18 @@ def search_for_unused(
 
     unused = set()  # going to hold all directories not needed anymore
 
-    all_dirs = os.listdir(current)
+    # scandir returns the full path and the entry type without additional stat calls
+    with os.scandir(current) as it:
+        all_dirs = list(it)
     if verbose:
         logging.info("Directories in %s: %i" % (current, len(all_dirs)))
-    for short_path in all_dirs:
-        path = os.path.join(current, short_path)
+    for entry in all_dirs:
+        path = entry.path
         status = job_dirs.get(path)
 
         if status is None and (filter_unused is None or any(x in path for x in filter_unused)):
             unused.add(path)
-        elif status == DIR_IN_GRAPH:
+        elif status == DIR_IN_GRAPH and entry.is_dir():
             # directory has sub directories used by current graph
             found = search_for_unused(job_dirs, path, verbose, filter_unused=filter_unused)
             unused.update(found)
@@ -242,9 +263,34 @@ def remove_directories(
     if len(dirs) == 0:
         return
 
-    input_var = "UNSET"
-    while input_var.lower() not in ("n", "y", ""):
-        input_var = input("Calculate size of affected directories? (Y/n): ")
+    size_pool = ThreadPool(gs.CLEANER_WORKER)
+    try:
+        if mode != "dryrun" and not force:
+            # start computing the sizes while waiting for the user, the result is usually wanted before deleting
+            sizes = size_pool.imap_unordered(_disk_usage, list(dirs))
+        else:
+            sizes = None
+        input_var = "UNSET"
+        while input_var.lower() not in ("n", "y", ""):
+            input_var = input("Calculate size of affected directories? (Y/n): ")
+        if input_var.lower() != "n":
+            if sizes is None:
+                sizes = size_pool.imap_unordered(_disk_usage, list(dirs))
+            total = 0
+            linked_files = {}
+            for num, (size, linked) in enumerate(sizes, 1):
+                total += size
+                linked_files.update(linked)
+                if num % 100 == 0:
+                    logging.info("Size of %d/%d directories: %s" % (num, len(dirs), _format_size(total)))
+            total += sum(linked_files.values())
+            logging.info("Total size of affected directories: %s" % _format_size(total))
+    finally:
+        # drop pending size computations if the user declined, terminate doesn't stop the running ones,
+        # so wait for them to avoid walking directories while they are deleted
+        size_pool.terminate()
+        size_pool.join()
+
     if input_var.lower() == "n":
         input_var = "UNSET"
         while input_var.lower() not in ("n", "y", ""):
@@ -265,16 +311,6 @@ def remove_directories(
                 if filter_printed is None or any(x in i for x in filter_printed):
                     logging.info(i + "  " + s)
 
-    else:
-        with tempfile.NamedTemporaryFile(mode="w") as tmp_file:
-            for directory in dirs:
-                tmp_file.write(directory + "\x00")
-            tmp_file.flush()
-            command = "du -sch --files0-from=%s" % tmp_file.name
-            p = os.popen(command)
-            print(p.read())
-            p.close()
-
     input_var = "UNSET"
     if mode == "dryrun":
         input_var = "n"
@@ -286,26 +322,92 @@ def remove_directories(
         input_var = input("%s (y/n): " % message)
 
     if input_var.lower() == "y":
-        for num, k in enumerate(dirs, 1):
-            if mode == "move":
+        if mode == "move":
+            for k in dirs:
                 logging.info("move: %s" % k)
                 # todo: k.{postfix} is may already used
                 shutil.move(k, k + "." + move_postfix)
-            elif mode == "remove":
-                logging.info("Delete: (%d/%d) %s" % (num, len(dirs), k))
+        elif mode == "remove":
+            # deleting is mostly waiting for the filesystem, remove multiple directories at once
+            num_lock = threading.Lock()
+            num = 0
+
+            def remove(k):
+                nonlocal num
+                with num_lock:
+                    num += 1
+                    logging.info("Delete: (%d/%d) %s" % (num, len(dirs), k))
                 if os.path.islink(k):
                     os.unlink(k)
                 else:
                     try:
-                        shutil.rmtree(k)
-                    except OSError as error:
+                        _rmtree(k)
+                    except (OSError, subprocess.CalledProcessError) as error:
                         print(error)
-            else:
-                assert False
+
+            with ThreadPool(gs.CLEANER_WORKER) as pool:
+                pool.map(remove, list(dirs))
+        else:
+            assert False
     else:
         logging.error("Abort")
 
 
+def _disk_usage(path: str):
+    """Disk usage of a directory tree similar to du, symlinks are not followed
+
+    :param path: directory to check
+    :return: used bytes of all files with a single link and a dict (device, inode) -> used bytes of all files with
+        multiple hard links, so that they can be counted only once over multiple directories
+    :rtype: (int, dict[(int, int), int])
+    """
+    linked = {}
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 0, linked
+    total = st.st_blocks * 512
+    stack = [path] if stat.S_ISDIR(st.st_mode) else []
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISDIR(st.st_mode):
+                        stack.append(entry.path)
+                        total += st.st_blocks * 512
+                    elif st.st_nlink > 1:
+                        linked[(st.st_dev, st.st_ino)] = st.st_blocks * 512
+                    else:
+                        total += st.st_blocks * 512
+        except OSError:
+            pass
+    return total, linked
+
+
+def _format_size(size: int) -> str:
+    """
+    :param size: size in bytes
+    :return: human readable size
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return "%.1f %s" % (size, unit)
+        size /= 1024
+    return "%.1f TiB" % size
+
+
+def _rmtree(path: str):
+    """Remove directory tree, uses rm if available since it is a lot faster than shutil.rmtree for large trees
+
+    :param path: directory to remove
+    """
+    if _RM_COMMAND:
+        subprocess.run([_RM_COMMAND, "-rf", "--", path], check=True)
+    else:
+        shutil.rmtree(path)
+
+
 def cleanup_jobs():
     """Go through all jobs in the current graph. If they are finished it remove its work directory and compress
     the log files"""
@@ -5,11 +5,16 @@ import copy
 import logging
 import os
 import psutil
+import random
+import time
 from ast import literal_eval
 
 import sisyphus.global_settings as gs
 import sisyphus.tools as tools
 
+# upper bound in seconds for the wait time between two retries of a failed queue command
+_MAX_RETRY_BACKOFF = 120
+
 
 class EngineBase:
     """
@@ -24,6 +29,20 @@ class EngineBase:
     def task_state(self, task, task_id):
         raise NotImplementedError
 
+    @staticmethod
+    def _sleep_with_backoff(backoff):
+        """
+        Sleep before retrying a failed command and return the backoff for the next retry. The wait time is
+        randomized around backoff to avoid that many processes retry at the same time.
+
+        :param float backoff: wait time in seconds, limited to _MAX_RETRY_BACKOFF
+        :return: doubled backoff, limited to _MAX_RETRY_BACKOFF
+        :rtype: float
+        """
+        backoff = min(backoff, _MAX_RETRY_BACKOFF)
+        time.sleep(backoff * (0.5 + random.random()))
+        return min(backoff * 2, _MAX_RETRY_BACKOFF)
+
     def start_engine(self):
         raise NotImplementedError
 
@@ -5,6 +5,7 @@ These settings can be overwritten via a ``settings.py`` file in the current dire
 # Author: Jan-Thorsten Peter <peter@cs.rwth-aachen.de>
 
 import logging
+import pickle
 import sys
 from typing import Dict
 
@@ -163,6 +164,8 @@ JOB_CLEANUP_KEEP_INPUT = True
 JOB_DEFAULT_KEEP_VALUE = 50
 #:
 CLEANER_PRINT_ALIAS = True
+#: How many directories are deleted in parallel by tk.cleaner
+CLEANER_WORKER = 16
 
 #: How many threads should update the graph in parallel, useful if the filesystem has a high latency
 GRAPH_WORKER = 16
@@ -170,10 +173,27 @@ GRAPH_WORKER = 16
 #: How many threads are used to setup the job directory and submit jobs
 MANAGER_SUBMIT_WORKER = 10
 
+#: How many threads check the states of the task ids of a parallel task, 1 checks them one after another.
+#: Only increase this if the used engine can handle concurrent task_state calls
+TASK_STATE_WORKER = 1
+
+#: How many worker processes are run in parallel by tk.run, either of independent jobs or of the task ids of a
+#: parallel task
+RUN_WORKER = 1
+
 #: How many locks can be used by all jobs (one lock per job). If there are more jobs than locks, locks are reused
 #: This could lead to a slowdown, but the number of locks per process is limited
 JOB_MAX_NUMBER_OF_LOCKS = 100
 
+#: Pickle protocol used to save jobs, pickled variables, cached results and objects written with tk.dump.
+#: The default protocol keeps the files readable by all supported python versions. Newer protocols, e.g.
+#: pickle.HIGHEST_PROTOCOL, are faster and more compact if all python versions reading the files support them
+PICKLE_PROTOCOL = pickle.DEFAULT_PROTOCOL
+
+#: Compression used by tk.dump, either "gzip" or "zstd". zstd is considerably faster for large objects but requires
+#: the zstandard module, also to load the files again. tk.load_file detects the compression automatically
+DUMP_COMPRESSION = "gzip"
+
 #: How often sisyphus will try to resubmit a task to the engine before returning a RETRY_ERROR
 MAX_SUBMIT_RETRIES = 3
 
@@ -222,6 +242,10 @@ WAIT_PERIOD_CACHE = 20
 WAIT_PERIOD_SSH_TIMEOUT = 15
 #: How many seconds should be waited before retrying to parse a failed qstat output
 WAIT_PERIOD_QSTAT_PARSING = 15
+#: Minimal and maximal number of seconds the SGE engine reuses the last queue state. The period is doubled each time
+#: the queue state did not change and reset to the minimum on any change
+WAIT_PERIOD_QUEUE_STATE_MIN = 5
+WAIT_PERIOD_QUEUE_STATE_MAX = 300
 #: How many seconds should be waited before retrying to bind to the desired port
 WAIT_PERIOD_HTTP_RETRY_BIND = 10
 #: How many seconds should be waited before cleaning up a finished job
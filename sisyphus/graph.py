@@ -234,6 +234,7 @@ class SISGraph(object):
 
     def __init__(self):
         self._targets = set()  # type: set[OutputTarget]
+        self._targets_version = 0
         self._active_targets = []  # type: list[OutputTarget]
         self._pool = None
         self.used_output_path = set()
@@ -249,6 +250,14 @@ class SISGraph(object):
     def targets(self):
         return self._targets
 
+    @property
+    def targets_version(self):
+        """
+        :return: counter which is increased whenever a target is added
+        :rtype: int
+        """
+        return self._targets_version
+
     @property
     def active_targets(self):
         return self._active_targets
@@ -287,6 +296,7 @@ class SISGraph(object):
             return
 
         self._targets.add(target)
+        self._targets_version += 1
 
         # check if output path is already used
         try:
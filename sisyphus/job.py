@@ -286,7 +286,7 @@ class Job(metaclass=JobSingleton):
 
         # export the actual job
         with gzip.open(self._sis_path(gs.JOB_SAVE), "w") as f:
-            pickle.dump(self, f)
+            pickle.dump(self, f, protocol=gs.PICKLE_PROTOCOL)
 
         with open(self._sis_path(gs.JOB_INFO), "w", encoding="utf-8") as f:
             for tag in self.tags:
@@ -422,14 +422,14 @@ class Job(metaclass=JobSingleton):
 
         # find logfile
         logfile = self._sis_path(log_name, task_id, abspath=True)
-        current_state = os.path.isfile(logfile)
 
         if update is None:
-            if current_state:
-                return minimal_file_age <= 0 or minimal_file_age < time.time() - os.path.getmtime(logfile)
-            else:
+            mtime = tools.file_mtime(logfile)
+            if mtime is None:
                 return False
+            return minimal_file_age <= 0 or minimal_file_age < time.time() - mtime
         else:
+            current_state = os.path.isfile(logfile)
             # create file
             if update and not current_state:
                 with open(logfile, "w"):
@@ -887,12 +887,11 @@ class Job(metaclass=JobSingleton):
         :param include_job_path:
         :return:
         """
-        return all(
-            [
-                i in self._sis_get_all_inputs(include_job_path=include_job_path) or i in self._sis_outputs
-                for i in required_inputs
-            ]
-        )
+        if not required_inputs:
+            return True
+        # collecting all inputs walks through all ancestors of this job, only do it once for all required inputs
+        inputs = self._sis_get_all_inputs(include_job_path=include_job_path)
+        return all(i in inputs or i in self._sis_outputs for i in required_inputs)
 
     def _sis_print_tree(
         self, visited, info="", current_prefix="", next_prefix="", out=sys.stdout, required_inputs=set()
@@ -458,7 +458,7 @@ class Variable(AbstractPath):
     def set(self, value):
         if self.pickle:
             with gzip.open(self.get_path(), "wb") as f:
-                pickle.dump(value, f)
+                pickle.dump(value, f, protocol=gs.PICKLE_PROTOCOL)
         else:
             with open(self.get_path(), "wt", encoding="utf-8") as f:
                 f.write("%s\n" % repr(value))
@@ -3,12 +3,15 @@
 from typing import Any
 from collections import defaultdict, namedtuple
 from enum import Enum
+from itertools import groupby
+from operator import itemgetter
 import getpass  # used to get username
 import logging
 import math
 import os
 import shlex
 import subprocess
+import threading
 import time
 
 import sisyphus.global_settings as gs
@@ -18,6 +21,14 @@ from sisyphus.global_settings import STATE_RUNNING, STATE_UNKNOWN, STATE_QUEUE,
 ENGINE_NAME = "slurm"
 TaskInfo = namedtuple("TaskInfo", ["job_id", "task_id", "state"])
 
+# first line printed by sbatch after a successful submission, followed by the job id
+_SBATCH_OK_PREFIX = "Submitted batch job "
+# the squeue watcher is considered stuck after missing this many updates
+_WATCHER_MAX_MISSED_UPDATES = 3
+# ssh prints this if a stale control socket blocks connection multiplexing
+_CTL_START = "ControlSocket"
+_CTL_END = "already exists, disabling multiplexing"
+
 
 def try_to_multiply(y, x, backup_value=None):
     """Tries to convert y to float multiply it by x and convert it back
@@ -48,6 +59,9 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
         ignore_jobs=[],
         memory_allocation_type=MemoryAllocationType.PER_NODE,
         job_name_mapping=None,
+        squeue_timeout=60,
+        sbatch_timeout=30,
+        squeue_iterate=None,
     ):
         """
 
@@ -62,6 +76,11 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
                                           Example mapping: 'path/to/file/JobName.H4sH.task' to 'JobName.H4sH.task'
                                           Warning: If the mapping is changed, the engine cannot recognize already
                                           running jobs anymore.
+        :param int squeue_timeout: timeout in seconds for a single squeue call
+        :param int sbatch_timeout: timeout in seconds for a single sbatch call
+        :param int|None squeue_iterate: if set, keep a single `squeue --iterate` process running while the engine is
+                                        started and update the queue state from its output every squeue_iterate
+                                        seconds instead of starting a new squeue call for every update
         """
         self._task_info_cache_last_update = 0
         self.gateway = gateway
@@ -71,6 +90,16 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
         self.ignore_jobs = ignore_jobs
         self.memory_allocation_type = memory_allocation_type
         self.job_name_mapping = job_name_mapping
+        self.squeue_timeout = squeue_timeout
+        self.sbatch_timeout = sbatch_timeout
+        self.squeue_iterate = squeue_iterate
+        self._task_info_cache = defaultdict(list)
+        self._task_info_cache_lock = threading.Lock()
+        self._last_squeue_set = frozenset()
+        self._submitted_keys = {}  # submit time of tasks changed by submitting since the last squeue snapshot
+        self._queue_watcher = None
+        self._queue_watcher_process = None
+        self._queue_watcher_stop = threading.Event()
 
     def _system_call_timeout_warn_msg(self, command: Any) -> str:
         if self.gateway:
@@ -82,36 +111,51 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
             return f"SSH command error: {command!s}"
         return f"Command error: {command!s}"
 
-    def system_call(self, command, send_to_stdin=None):
+    def _get_system_command(self, command):
         """
-        :param list[str] command: qsub command
-        :param str|None send_to_stdin: shell code, e.g. the command itself to execute
-        :return: stdout, stderr, retval
-        :rtype: list[bytes], list[bytes], int
+        :param list[str] command:
+        :return: command wrapped in an ssh call if a gateway is used
+        :rtype: list[str]
         """
         if self.gateway:
             escaped_command = [shlex.quote(s) for s in command]  # parameters need to be shell safe when sending via ssh
-            system_command = ["ssh", "-x", self.gateway, "-o", "BatchMode=yes"] + [
+            return ["ssh", "-x", self.gateway, "-o", "BatchMode=yes"] + [
                 " ".join(["cd", os.getcwd(), "&&"] + escaped_command)
             ]
         else:
             # no gateway given, skip ssh local
-            system_command = command
+            return command
+
+    def system_call(self, command, send_to_stdin=None, timeout=30):
+        """
+        :param list[str] command: qsub command
+        :param str|None send_to_stdin: shell code, e.g. the command itself to execute
+        :param int timeout: timeout in seconds for the command
+        :return: stdout, stderr, retval
+        :rtype: list[str], list[str], int
+        """
+        system_command = self._get_system_command(command)
 
         logging.debug("shell_cmd: %s" % " ".join(system_command))
-        if send_to_stdin:
-            send_to_stdin = send_to_stdin.encode()
 
-        p = subprocess.run(system_command, input=send_to_stdin, capture_output=True, timeout=30)
+        p = subprocess.run(
+            system_command,
+            input=send_to_stdin,
+            capture_output=True,
+            timeout=timeout,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
 
         def fix_output(o):
             """
             split output and drop last empty line
-            :param bytes o:
-            :rtype: list[bytes]
+            :param str o:
+            :rtype: list[str]
             """
-            o = o.split(b"\n")
-            if o[-1] != b"":
+            o = o.split("\n")
+            if o[-1] != "":
                 print(o[-1])
                 assert False
             return o[:-1]
@@ -123,13 +167,11 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
         # Check for ssh error
         err_ = []
         for raw_line in err:
-            lstart = "ControlSocket"
-            lend = "already exists, disabling multiplexing"
-            line = raw_line.decode("utf8").strip()
-            if line.startswith(lstart) and line.endswith(lend):
+            line = raw_line.strip()
+            if line.startswith(_CTL_START) and line.endswith(_CTL_END):
                 # found ssh connection problem
-                ssh_file = line[len(lstart) : len(lend)].strip()
-                logging.warning("SSH Error %s" % line.strip())
+                ssh_file = line[len(_CTL_START) : -len(_CTL_END)].strip()
+                logging.warning("SSH Error %s" % line)
                 try:
                     os.unlink(ssh_file)
                     logging.info("Delete file %s" % ssh_file)
@@ -204,27 +246,36 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
             return
 
         submitted = []
+        for start_id, end_id, step_size in self._runs(task_ids):
+            job_id = self.submit_helper(call, logpath, rqmt, name, task_name, start_id, end_id, step_size)
+            submitted.append((list(range(start_id, end_id + 1, step_size)), job_id))
+        return ENGINE_NAME, submitted
+
+    @staticmethod
+    def _runs(task_ids):
+        """
+        Split task ids into arithmetic progressions which can each be submitted as one array job.
+        Multiple runs should only happen if only parts of the jobs are restarted.
+
+        :param list[int] task_ids:
+        :return: (start_id, end_id, step_size) for each run, end_id is inclusive
+        :rtype: Iterator[(int, int, int)]
+        """
         start_id, end_id, step_size = (None, None, None)
-        for task_id in task_ids:
+        for task_id in sorted(task_ids):
             if start_id is None:
-                start_id = task_id
-            elif end_id is None:
+                start_id = end_id = task_id
+            elif step_size is None:
                 end_id = task_id
                 step_size = end_id - start_id
             elif task_id == end_id + step_size:
                 end_id = task_id
             else:
-                # this id doesn't fit pattern, this should only happen if only parts of the jobs are restarted
-                job_id = self.submit_helper(call, logpath, rqmt, name, task_name, start_id, end_id, step_size)
-                submitted.append((list(range(start_id, end_id, step_size)), job_id))
-                start_id, end_id, step_size = (task_id, None, None)
-        assert start_id is not None
-        if end_id is None:
-            end_id = start_id
-            step_size = 1
-        job_id = self.submit_helper(call, logpath, rqmt, name, task_name, start_id, end_id, step_size)
-        submitted.append((list(range(start_id, end_id, step_size)), job_id))
-        return ENGINE_NAME, submitted
+                # this id doesn't fit pattern
+                yield start_id, end_id, step_size
+                start_id, end_id, step_size = (task_id, task_id, None)
+        if start_id is not None:
+            yield start_id, end_id, step_size or 1
 
     def submit_helper(self, call, logpath, rqmt, name, task_name, start_id, end_id, step_size):
         """
@@ -247,53 +298,53 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
         sbatch_call += ["-a", f"{start_id}-{end_id}:{step_size}"]
         sbatch_call += [f"--wrap=srun -o {out_log_file} {' '.join(call)}"]
 
+        backoff = gs.WAIT_PERIOD_SSH_TIMEOUT
         while True:
             try:
-                out, err, retval = self.system_call(sbatch_call)
+                out, err, retval = self.system_call(sbatch_call, timeout=self.sbatch_timeout)
             except subprocess.TimeoutExpired:
                 logging.warning(self._system_call_timeout_warn_msg(sbatch_call))
-                time.sleep(gs.WAIT_PERIOD_SSH_TIMEOUT)
+                backoff = self._sleep_with_backoff(backoff)
                 continue
             break
 
-        ref_output = ["Submitted", "batch", "job"]
-        ref_output = [i.encode() for i in ref_output]
-
         job_id = None
         if len(out) == 1:
-            sout = out[0].split()
-            if retval != 0 or len(sout) != 4 or sout[0:3] != ref_output:
-                print(retval, len(err), len(sout), sout[0:3], ref_output)
+            if retval != 0 or not out[0].startswith(_SBATCH_OK_PREFIX):
+                print(retval, len(err), out[0], _SBATCH_OK_PREFIX)
                 logging.error("Error to submit job")
                 logging.error("SBATCH command: %s" % " ".join(sbatch_call))
                 for line in out:
-                    logging.error("Output: %s" % line.decode())
+                    logging.error("Output: %s" % line)
                 for line in err:
-                    logging.error("Error: %s" % line.decode())
+                    logging.error("Error: %s" % line)
                 # reset cache, after error
                 self.reset_cache()
             else:
-                job_id = sout[3].decode().split(".")
+                job_id = out[0][len(_SBATCH_OK_PREFIX) :].strip().split(".")
 
                 logging.info("Submitted with job_id: %s %s" % (job_id, name))
-                for task_id in range(start_id, end_id, step_size):
-                    self._task_info_cache[(name, task_id)].append((job_id, "PENDING"))
+                submit_time = time.time()
+                with self._task_info_cache_lock:
+                    for task_id in range(start_id, end_id + 1, step_size):
+                        self._task_info_cache[(name, task_id)].append((job_id, "PENDING"))
+                        self._submitted_keys[(name, task_id)] = submit_time
 
                 if err:
                     logging.warning(f"Got error while submitting job (but job {job_id} was submitted)")
                     logging.warning("SBATCH command: %s" % " ".join(sbatch_call))
                     for line in out:
-                        logging.warning("Output: %s" % line.decode())
+                        logging.warning("Output: %s" % line)
                     for line in err:
-                        logging.warning("Error: %s" % line.decode())
+                        logging.warning("Error: %s" % line)
 
         else:
             logging.error("Error to submit job, return value: %i" % retval)
             logging.error("SBATCH command: %s" % " ".join(sbatch_call))
             for line in out:
-                logging.error("Output: %s" % line.decode())
+                logging.error("Output: %s" % line)
             for line in err:
-                logging.error("Error: %s" % line.decode())
+                logging.error("Error: %s" % line)
 
             # reset cache, after error
             self.reset_cache()
@@ -302,15 +353,12 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
     def reset_cache(self):
         self._task_info_cache_last_update = -10
 
-    def queue_state(self):
-        """Returns list with all currently running tasks in this queue"""
-
-        if time.time() - self._task_info_cache_last_update < 30:
-            # use cached value
-            return self._task_info_cache
-
-        # get bjobs output
-        system_command = [
+    @staticmethod
+    def _squeue_command():
+        """
+        :rtype: list[str]
+        """
+        return [
             "squeue",
             "-h",
             "--array",
@@ -319,35 +367,142 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
             "-O",
             "arrayjobid,arraytaskid,state,name:1000",
         ]
+
+    @staticmethod
+    def _parse_squeue_output(out):
+        """
+        :param list[str] out: output lines of squeue
+        :return: list of ((name, task_id), (job_id, state)) in the order given by squeue
+        :rtype: list[((str,int),(str,str))]
+        """
+        parsed = []
+        append = parsed.append
+        for line in out:
+            try:
+                number, task, state, name = line.split()[:4]
+                append(((name, 1 if task == "N/A" else int(task)), (number, state)))
+            except Exception:
+                logging.warning("Failed to parse squeue output: %s" % line)
+        return parsed
+
+    def _update_task_info_cache(self, entries, snapshot_start=None):
+        """
+        Update the task info cache with a new squeue snapshot. Only tasks whose entries changed since the
+        last snapshot are rebuilt, the updated cache is published as a new dict.
+
+        :param list[((str,int),(str,str))] entries: parsed squeue output
+        :param float|None snapshot_start: time before squeue was called, tasks submitted later might be missing
+                                          from the snapshot and keep their entries. Defaults to now.
+        :rtype: defaultdict[(str,int),list[(str,str)]]
+        """
+        if snapshot_start is None:
+            snapshot_start = time.time()
+        new_set = frozenset(entries)
+        with self._task_info_cache_lock:
+            # the watcher and the polling fallback may update concurrently, diff against the last published snapshot
+            changed_keys = {key for key, _ in new_set.symmetric_difference(self._last_squeue_set)}
+            submitted = self._submitted_keys
+            self._submitted_keys = {key: t for key, t in submitted.items() if t >= snapshot_start}
+            changed_keys |= submitted.keys()
+            # keep the entries of tasks submitted after the snapshot started until a later snapshot lists them
+            changed_keys -= self._submitted_keys.keys()
+            task_infos = self._task_info_cache.copy()
+            # drop tasks which are no longer listed, e.g. entries added after submitting or by lookups
+            stale_keys = task_infos.keys() - {key for key, _ in new_set} - self._submitted_keys.keys()
+            for key in changed_keys | stale_keys:
+                task_infos.pop(key, None)
+
+            # group all changed entries of the same task, so each key is only inserted once
+            changed = [entry for entry in entries if entry[0] in changed_keys]
+            changed.sort(key=itemgetter(0))
+            for key, group in groupby(changed, key=itemgetter(0)):
+                task_infos[key] = [info for _, info in group]
+
+            self._task_info_cache = task_infos
+            self._task_info_cache_last_update = time.time()
+            self._last_squeue_set = new_set
+        return task_infos
+
+    def _start_queue_watcher(self):
+        """Start a thread reading the queue state from a long running `squeue --iterate` process"""
+        if self._queue_watcher is not None and self._queue_watcher.is_alive():
+            return
+        self._queue_watcher_stop.clear()
+        self._queue_watcher = threading.Thread(target=self._queue_watcher_loop, name="squeue watcher", daemon=True)
+        self._queue_watcher.start()
+
+    def _stop_queue_watcher(self):
+        self._queue_watcher_stop.set()
+        process = self._queue_watcher_process
+        if process is not None and process.poll() is None:
+            process.terminate()
+        self._queue_watcher = None
+
+    def _queue_watcher_loop(self):
+        system_command = self._get_system_command(self._squeue_command() + ["--iterate=%i" % self.squeue_iterate])
+        backoff = gs.WAIT_PERIOD_SSH_TIMEOUT
+        while not self._queue_watcher_stop.is_set():
+            logging.debug("shell_cmd: %s" % " ".join(system_command))
+            process = subprocess.Popen(
+                system_command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+            self._queue_watcher_process = process
+            snapshot = []
+            # the next iteration of squeue is only started after the previous one was printed
+            snapshot_start = time.time()
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                if line:
+                    snapshot.append(line)
+                    continue
+                # squeue separates the output of two iterations by an empty line
+                self._update_task_info_cache(self._parse_squeue_output(snapshot), snapshot_start)
+                snapshot = []
+                snapshot_start = time.time()
+                backoff = gs.WAIT_PERIOD_SSH_TIMEOUT
+            process.wait()
+            if not self._queue_watcher_stop.is_set():
+                logging.warning(self._system_call_error_warn_msg(system_command))
+                backoff = self._sleep_with_backoff(backoff)
+
+    def queue_state(self):
+        """Returns list with all currently running tasks in this queue"""
+
+        if (
+            self._queue_watcher is not None
+            and time.time() - self._task_info_cache_last_update < _WATCHER_MAX_MISSED_UPDATES * self.squeue_iterate
+        ):
+            # queue state is kept up to date by the squeue watcher, poll squeue below if it stopped updating
+            with self._task_info_cache_lock:
+                return self._task_info_cache
+
+        if time.time() - self._task_info_cache_last_update < 30:
+            # use cached value
+            return self._task_info_cache
+
+        # get bjobs output
+        system_command = self._squeue_command()
+        backoff = gs.WAIT_PERIOD_SSH_TIMEOUT
         while True:
+            snapshot_start = time.time()
             try:
-                out, err, retval = self.system_call(system_command)
+                out, err, retval = self.system_call(system_command, timeout=self.squeue_timeout)
                 if retval != 0:
                     logging.warning(self._system_call_error_warn_msg(system_command))
                     time.sleep(gs.WAIT_PERIOD_QSTAT_PARSING)
                     continue
             except subprocess.TimeoutExpired:
                 logging.warning(self._system_call_timeout_warn_msg(system_command))
-                time.sleep(gs.WAIT_PERIOD_SSH_TIMEOUT)
+                backoff = self._sleep_with_backoff(backoff)
                 continue
             break
 
-        task_infos = defaultdict(list)
-        for line in out:
-            line = line.decode()
-            try:
-                field = line.split()
-                name = field[3]
-                state = field[2]
-                task = 1 if field[1] == "N/A" else int(field[1])
-                number = field[0]
-                task_infos[(name, task)].append((number, state))
-            except Exception:
-                logging.warning("Failed to parse squeue output: %s" % line)
-
-        self._task_info_cache = task_infos
-        self._task_info_cache_last_update = time.time()
-        return task_infos
+        return self._update_task_info_cache(self._parse_squeue_output(out), snapshot_start)
 
     def task_state(self, task, task_id):
         """Return task state:
@@ -380,12 +535,14 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
             return STATE_QUEUE_ERROR
 
     def start_engine(self):
-        """No starting action required with the current implementation"""
-        pass
+        """Start the squeue watcher if squeue_iterate is set, otherwise no starting action is required"""
+        if self.squeue_iterate:
+            self._start_queue_watcher()
 
     def stop_engine(self):
-        """No stopping action required with the current implementation"""
-        pass
+        """Stop the squeue watcher if it is running"""
+        if self._queue_watcher is not None:
+            self._stop_queue_watcher()
 
     @staticmethod
     def get_task_id(task_id):
@@ -408,10 +565,9 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
         #
         # SLURM tasks represent jobs that span multiple nodes at the same time
         # (e.g. multi-node multi-GPU trainings consist of one SLURM task per node).
-        slurm_num_tasks = int(
-            next(filter(None, (os.getenv(var, None) for var in ["SLURM_NTASKS", "SLURM_NPROCS"])), "1")
-        )
-        slurm_task_id = int(os.getenv("SLURM_PROCID", "0"))
+        env = os.environ
+        slurm_num_tasks = int(next((v for v in (env.get(n) for n in ("SLURM_NTASKS", "SLURM_NPROCS")) if v), "1"))
+        slurm_task_id = int(env.get("SLURM_PROCID", "0"))
         array_task_id = self.get_task_id(None)
 
         # keep backwards compatibility: only change output file name for multi-SLURM-task jobs
@@ -421,16 +577,16 @@ class SimpleLinuxUtilityForResourceManagementEngine(EngineBase):
             os.unlink(logpath)
 
         job_id = next(
-            filter(None, (os.getenv(name, None) for name in ["SLURM_JOB_ID", "SLURM_JOBID", "SLURM_ARRAY_JOB_ID"])), "0"
+            (v for v in (env.get(n) for n in ("SLURM_JOB_ID", "SLURM_JOBID", "SLURM_ARRAY_JOB_ID")) if v), "0"
         )
         engine_logpath = (
             os.path.dirname(logpath)
             + "/engine/"
-            + os.getenv("SLURM_JOB_NAME")
+            + env.get("SLURM_JOB_NAME")
             + "."
             + job_id
             + "."
-            + os.getenv("SLURM_ARRAY_TASK_ID", "1")
+            + env.get("SLURM_ARRAY_TASK_ID", "1")
         )
         if slurm_num_tasks > 1:
             engine_logpath += f".{slurm_task_id}"
@@ -1,6 +1,8 @@
 # Author: Jan-Thorsten Peter <peter@cs.rwth-aachen.de>
 
 from typing import Any
+import functools
+import io
 import os
 import subprocess
 
@@ -9,8 +11,12 @@ import logging
 
 import getpass  # used to get username
 import math
+import re
+import shlex
+import shutil
+import tempfile
 
-import xml.etree.cElementTree
+import xml.etree.ElementTree
 from collections import defaultdict, namedtuple
 
 import sisyphus.global_settings as gs
@@ -20,7 +26,26 @@ from sisyphus.global_settings import STATE_RUNNING, STATE_UNKNOWN, STATE_QUEUE,
 ENGINE_NAME = "sge"
 TaskInfo = namedtuple("TaskInfo", ["job_id", "task_id", "state"])
 
-
+# tags of the job_list children read from the qstat output
+_JOB_NAME_TAG = "JB_name"
+_JOB_NUMBER_TAG = "JB_job_number"
+_STATE_TAG = "state"
+_TASKS_TAG = "tasks"
+
+# a single task id or a task range "start-end:step", multiple entries are separated by commas
+_TASK_RE = re.compile(r"(\d+)(?:-(\d+)(?::(\d+))?)?")
+# printed after each qsub call of a batched submission, followed by the return value of qsub
+_QSUB_BATCH_SEPARATOR = b"SIS_QSUB_RETVAL="
+# number of attempts for a qsub call before the submission is treated as failed
+_MAX_SUBMIT_ATTEMPTS = 10
+# ssh prints this if a stale control socket blocks connection multiplexing
+_CTL_START = b"ControlSocket"
+_CTL_END = b"already exists, disabling multiplexing"
+# output of a successful qsub call: job number, task range and (possibly truncated) job name
+_QSUB_OK = re.compile(rb'^Your job-array (\d+)\.(\d+-\d+:\d+) \("([^"]+)"\) has been submitted\s*$')
+
+
+@functools.lru_cache(maxsize=4096)
 def escape_name(name):
     """
     :param str name:
@@ -29,6 +54,55 @@ def escape_name(name):
     return name.replace("/", ".")
 
 
+def parse_task_ids(string):
+    """
+    Return list with all task ids given in the tasks field of qstat, e.g. "1-5:2,8" -> [1, 3, 5, 8]
+
+    :param str string:
+    :rtype: list[int]
+    """
+    task_ids = []
+    for m in _TASK_RE.finditer(string):
+        start, end, step_size = m.groups()
+        if end is None:
+            task_ids.append(int(start))
+        else:
+            task_ids.extend(range(int(start), int(end) + 1, int(step_size or 1)))
+    return task_ids
+
+
+def _add_task_info(task_infos, key, info):
+    """
+    Add info to task_infos. Since a task is almost always listed only once, the info is stored directly
+    and only replaced by a list of infos if the task shows up again.
+
+    :param dict[(str,int),(str,str)|list[(str,str)]] task_infos: (name, task_id) -> (job_number, state) or list of it
+    :param (str,int) key: (name, task_id)
+    :param (str,str) info: (job_number, state)
+    """
+    prev = task_infos.get(key)
+    if prev is None:
+        task_infos[key] = info
+    elif isinstance(prev, tuple):
+        task_infos[key] = [prev, info]
+    else:
+        prev.append(info)
+
+
+def _as_gib(value):
+    """
+    Format a size given in GB as rounded up integer with unit, strings which are not a number,
+    e.g. "500M", are returned unchanged
+
+    :param int|float|str value:
+    :rtype: str
+    """
+    try:
+        return "%iG" % math.ceil(float(value))
+    except ValueError:
+        return value
+
+
 def try_to_multiply(y, x, backup_value=None):
     """
     Tries to convert y to float multiply it by x and convert it back
@@ -52,7 +126,15 @@ def try_to_multiply(y, x, backup_value=None):
 
 
 class SonOfGridEngine(EngineBase):
-    def __init__(self, default_rqmt, gateway=None, auto_clean_eqw=True, ignore_jobs=None, pe_name="mpi"):
+    def __init__(
+        self,
+        default_rqmt,
+        gateway=None,
+        auto_clean_eqw=True,
+        ignore_jobs=None,
+        pe_name="mpi",
+        ssh_control_persist=None,
+    ):
         """
 
         :param dict default_rqmt: dictionary with the default rqmts
@@ -64,15 +146,30 @@ class SonOfGridEngine(EngineBase):
         :param str pe_name: used to select parallel environment (PE), when multi_node_slots is set in rqmt,
                             as `-pe <pe_name> <multi_node_slots>`.
                             The default "mpi" is somewhat arbitrarily chosen as we have it in our environment.
+        :param int|None ssh_control_persist: if a gateway is used, keep one multiplexed ssh connection open for this
+                                             many seconds after the last call and reuse it for all calls.
+                                             If None, the ssh configuration of the user is used.
         """
+        self._task_info_cache = {}
         self._task_info_cache_last_update = 0
+        self._poll_interval = gs.WAIT_PERIOD_QUEUE_STATE_MIN
+        self._pending_clear = set()  # "job_number.task_id" of tasks in error state to be cleared
         self.gateway = gateway
         self.default_rqmt = default_rqmt
         self.auto_clean_eqw = auto_clean_eqw
         if ignore_jobs is None:
             ignore_jobs = []
         self.ignore_jobs = ignore_jobs
+        # job_number -> task ids to ignore, avoids formatting a job id string for each task in queue_state
+        self._ignore_by_job = defaultdict(set)
+        for ignore_job in ignore_jobs:
+            job_number, _, task_id = ignore_job.rpartition(".")
+            self._ignore_by_job[job_number].add(int(task_id))
         self.pe_name = pe_name
+        self._username = getpass.getuser()
+        self._options_cache = {}  # hashable rqmt items -> qsub arguments
+        self.ssh_control_persist = ssh_control_persist
+        self._ssh_control_dir = None  # private directory for the control socket, created on first use
 
     def _system_call_timeout_warn_msg(self, command: Any) -> str:
         if self.gateway:
@@ -84,53 +181,67 @@ class SonOfGridEngine(EngineBase):
             return f"SSH command error: {command!s}"
         return f"Command error: {command!s}"
 
-    def system_call(self, command, send_to_stdin=None):
+    def _ssh_control_options(self):
+        """
+        :return: ssh options to share one connection to the gateway between all calls
+        :rtype: list[str]
+        """
+        if self.ssh_control_persist is None:
+            return []
+        if self._ssh_control_dir is None:
+            self._ssh_control_dir = tempfile.mkdtemp(prefix="sisyphus-ssh-")
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            "ControlPersist=%i" % self.ssh_control_persist,
+            "-o",
+            "ControlPath=%s" % self._ssh_control_path(),
+        ]
+
+    def _ssh_control_path(self):
+        """
+        :return: path of the control socket, ssh replaces the %-tokens by the user, host and port
+        :rtype: str
+        """
+        return os.path.join(self._ssh_control_dir, "%r@%h:%p")
+
+    def system_call(self, command, send_to_stdin=None, raw=False):
         """
         :param list[str] command: qsub command
-        :param str|None send_to_stdin: shell code, e.g. the command itself to execute
+        :param str|bytes|None send_to_stdin: shell code, e.g. the command itself to execute
+        :param bool raw: return stdout as one unsplit bytes object
         :return: stdout, stderr, retval
-        :rtype: list[bytes], list[bytes], int
+        :rtype: list[bytes]|bytes, list[bytes], int
         """
         if self.gateway:
-            system_command = ["ssh", "-x", self.gateway, "-o", "BatchMode=yes"] + [
-                " ".join(["cd", os.getcwd(), "&&"] + command)
-            ]
+            system_command = (
+                ["ssh", "-x", self.gateway, "-o", "BatchMode=yes"]
+                + self._ssh_control_options()
+                + [" ".join(["cd", os.getcwd(), "&&"] + command)]
+            )
         else:
             # no gateway given, skip ssh local
             system_command = command
 
         logging.debug("shell_cmd: %s" % " ".join(system_command))
-        if send_to_stdin:
+        if send_to_stdin and not isinstance(send_to_stdin, (bytes, bytearray)):
             send_to_stdin = send_to_stdin.encode()
 
         p = subprocess.run(system_command, input=send_to_stdin, capture_output=True, timeout=30)
 
-        def fix_output(o):
-            """
-            split output and drop last empty line
-            :param bytes o:
-            :rtype: list[bytes]
-            """
-            o = o.split(b"\n")
-            if o[-1] != b"":
-                print(o[-1])
-                assert False
-            return o[:-1]
-
-        out = fix_output(p.stdout)
-        err = fix_output(p.stderr)
+        out = p.stdout if raw else p.stdout.splitlines()
+        err = p.stderr.splitlines()
         retval = p.returncode
 
         # Check for ssh error
         err_ = []
         for raw_line in err:
-            lstart = "ControlSocket"
-            lend = "already exists, disabling multiplexing"
-            line = raw_line.decode("utf8").strip()
-            if line.startswith(lstart) and line.endswith(lend):
+            if raw_line.startswith(_CTL_START) and raw_line.rstrip().endswith(_CTL_END):
                 # found ssh connection problem
-                ssh_file = line[len(lstart) : len(lend)].strip()
-                logging.warning("SSH Error %s" % line.strip())
+                line = raw_line.strip()
+                ssh_file = line[len(_CTL_START) : -len(_CTL_END)].strip().decode("utf8", "replace")
+                logging.warning("SSH Error %s" % line.decode("utf8", "replace"))
                 try:
                     os.unlink(ssh_file)
                     logging.info("Delete file %s" % ssh_file)
@@ -141,12 +252,57 @@ class SonOfGridEngine(EngineBase):
 
         return out, err_, retval
 
+    def _retry(self, command, send_to_stdin=None, max_attempts=None, check_retval=False, raw=False):
+        """
+        Run system_call and retry on timeouts, and on non zero return values if check_retval is set.
+        The wait time between attempts grows exponentially and is randomized to avoid synchronized retries.
+
+        :param list[str] command:
+        :param str|bytes|None send_to_stdin:
+        :param int|None max_attempts: retry until the command succeeds if None
+        :param bool check_retval:
+        :param bool raw:
+        :return: stdout, stderr, retval as returned by system_call, or an empty stdout and retval -1 if
+            all attempts timed out
+        :rtype: list[bytes]|bytes, list[bytes], int
+        """
+        attempt = 0
+        while True:
+            try:
+                out, err, retval = self.system_call(command, send_to_stdin, raw=raw)
+                if not check_retval or retval == 0:
+                    return out, err, retval
+                logging.warning(self._system_call_error_warn_msg(command))
+                wait_period = gs.WAIT_PERIOD_QSTAT_PARSING
+            except subprocess.TimeoutExpired:
+                logging.warning(self._system_call_timeout_warn_msg(command))
+                out, err, retval = (b"" if raw else []), [b"Timeout after %i attempts" % (attempt + 1)], -1
+                wait_period = gs.WAIT_PERIOD_SSH_TIMEOUT
+            attempt += 1
+            if max_attempts is not None and attempt >= max_attempts:
+                return out, err, retval
+            self._sleep_with_backoff(wait_period * 2 ** (attempt - 1))
+
     def options(self, rqmt):
-        out = []
+        """
+        :param dict[str] rqmt:
+        :return: qsub arguments for the given requirements, cached for identical requirements
+        :rtype: list[str]
+        """
+        # the type is part of the key since e.g. 1 and 1.0 or 1 and True are equal but formatted differently
+        key = tuple((k, type(v), tuple(v) if isinstance(v, list) else v) for k, v in sorted(rqmt.items()))
         try:
-            mem = "%iG" % math.ceil(float(rqmt["mem"]))
-        except ValueError:
-            mem = rqmt["mem"]
+            options = self._options_cache.get(key)
+        except TypeError:
+            # some value is not hashable, skip cache
+            return self._options(rqmt)
+        if options is None:
+            options = self._options_cache[key] = tuple(self._options(rqmt))
+        return list(options)
+
+    def _options(self, rqmt):
+        out = []
+        mem = _as_gib(rqmt["mem"])
         # mem = try_to_multiply(s['mem'], 1024*1024*1024) # convert to Gigabyte if possible
 
         out.append("-l")
@@ -155,21 +311,15 @@ class SonOfGridEngine(EngineBase):
         out.append("-l")
 
         if "rss" in rqmt:
-            try:
-                rss = "%iG" % math.ceil(float(rqmt["rss"]))
-            except ValueError:
-                rss = rqmt["rss"]
+            rss = _as_gib(rqmt["rss"])
             # rss = try_to_multiply(s['rss'], 1024*1024*1024) # convert to Gigabyte if possible
             out.append("h_rss=%s" % rss)
         else:
             out.append("h_rss=%s" % mem)
 
-        try:
-            file_size = "%iG" % math.ceil(float(rqmt["file_size"]))
-        except (ValueError, KeyError):
-            # If a different default value is wanted it can be overwritten by adding
-            # 'file_size' to the default_rqmt of this engine.
-            file_size = rqmt.get("file_size", "50G")
+        # If a different default value is wanted it can be overwritten by adding
+        # 'file_size' to the default_rqmt of this engine.
+        file_size = _as_gib(rqmt.get("file_size", "50G"))
 
         out.append("-l")
         out.append("h_fsize=%s" % file_size)
@@ -212,29 +362,49 @@ class SonOfGridEngine(EngineBase):
             # skip empty list
             return
 
-        submitted = []
+        runs = []
         start_id, end_id, step_size = (None, None, None)
         for task_id in task_ids:
             if start_id is None:
-                start_id = task_id
-            elif end_id is None:
+                start_id = end_id = task_id
+            elif step_size is None:
                 end_id = task_id
                 step_size = end_id - start_id
             elif task_id == end_id + step_size:
                 end_id = task_id
             else:
                 # this id doesn't fit pattern, this should only happen if only parts of the jobs are restarted
-                job_id = self.submit_helper(call, logpath, rqmt, name, task_name, start_id, end_id, step_size)
-                submitted.append((list(range(start_id, end_id, step_size)), job_id))
-                start_id, end_id, step_size = (task_id, None, None)
+                runs.append((start_id, end_id, step_size))
+                start_id, end_id, step_size = (task_id, task_id, None)
         assert start_id is not None
-        if end_id is None:
-            end_id = start_id
-            step_size = 1
-        job_id = self.submit_helper(call, logpath, rqmt, name, task_name, start_id, end_id, step_size)
-        submitted.append((list(range(start_id, end_id, step_size)), job_id))
+        runs.append((start_id, end_id, step_size or 1))
+
+        if self.gateway and len(runs) > 1:
+            # avoid one ssh connection per array job
+            job_ids = self.submit_batch_helper(call, logpath, rqmt, name, task_name, runs)
+        else:
+            job_ids = [self.submit_helper(call, logpath, rqmt, name, task_name, *run) for run in runs]
+
+        submitted = []
+        for (start_id, end_id, step_size), job_id in zip(runs, job_ids):
+            submitted.append((list(range(start_id, end_id + 1, step_size)), job_id))
         return ENGINE_NAME, submitted
 
+    def qsub_call(self, logpath, rqmt, name, start_id, end_id, step_size):
+        """
+        :param str logpath:
+        :param dict[str] rqmt:
+        :param str name: escaped task name
+        :param int start_id:
+        :param int end_id:
+        :param int step_size:
+        :rtype: list[str]
+        """
+        qsub_call = ["qsub", "-cwd", "-N", name, "-j", "y", "-o", logpath, "-S", "/bin/bash", "-m", "n"]
+        qsub_call += self.options(rqmt)
+        qsub_call += ["-t", "%i-%i:%i" % (start_id, end_id, step_size)]
+        return qsub_call
+
     def submit_helper(self, call, logpath, rqmt, name, task_name, start_id, end_id, step_size):
         """
         :param list[str] call:
@@ -248,32 +418,78 @@ class SonOfGridEngine(EngineBase):
         :rtype: str|None
         """
         name = escape_name(name)
-        qsub_call = ["qsub", "-cwd", "-N", name, "-j", "y", "-o", logpath, "-S", "/bin/bash", "-m", "n"]
-        qsub_call += self.options(rqmt)
+        qsub_call = self.qsub_call(logpath, rqmt, name, start_id, end_id, step_size)
+        command = (" ".join(call) + "\n").encode()
+        out, err, retval = self._retry(qsub_call, command, max_attempts=_MAX_SUBMIT_ATTEMPTS)
+        return self.check_submit_output(qsub_call, name, start_id, end_id, step_size, out, err, retval)
 
-        qsub_call += ["-t", "%i-%i:%i" % (start_id, end_id, step_size)]
-        command = " ".join(call) + "\n"
-        while True:
-            try:
-                out, err, retval = self.system_call(qsub_call, command)
-            except subprocess.TimeoutExpired:
-                logging.warning(self._system_call_timeout_warn_msg(qsub_call))
-                time.sleep(gs.WAIT_PERIOD_SSH_TIMEOUT)
-                continue
-            break
+    def submit_batch_helper(self, call, logpath, rqmt, name, task_name, runs):
+        """
+        Submit one array job per run with a single system call. Each qsub call gets the command via echo,
+        since all calls share one stdin, and the output of each call is terminated by a separator line.
 
-        ref_output = ["Your", "job-array", '("%s")' % name, "has", "been", "submitted"]
-        ref_output = [i.encode() for i in ref_output]
+        :param list[str] call:
+        :param str logpath:
+        :param dict[str] rqmt:
+        :param str name:
+        :param str task_name:
+        :param list[(int,int,int)] runs: start_id, end_id (inclusive) and step_size of each array job
+        :return: job id for each run, None if the submission failed
+        :rtype: list[str|None]
+        """
+        name = escape_name(name)
+        qsub_calls = [self.qsub_call(logpath, rqmt, name, *run) for run in runs]
+        command = shlex.quote(" ".join(call))
+        separator = _QSUB_BATCH_SEPARATOR.decode()
+        batch_call = ["{"]
+        for qsub_call in qsub_calls:
+            batch_call += ["echo", command, "|"] + qsub_call + ["2>&1", ";", "echo", separator + "$?", ";"]
+        batch_call += ["}"]
+        # a timed out batch may already have submitted some array jobs, so it is never repeated. Runs without
+        # output are reported as failed and resubmitted by the manager if they don't show up in the queue
+        out, err, retval = self._retry(batch_call, max_attempts=1)
+
+        # split output into the outputs of the single qsub calls
+        outputs = []
+        current = []
+        for line in out:
+            if line.startswith(_QSUB_BATCH_SEPARATOR):
+                outputs.append((current, int(line[len(_QSUB_BATCH_SEPARATOR) :])))
+                current = []
+            else:
+                current.append(line)
 
+        job_ids = []
+        for i, (qsub_call, run) in enumerate(zip(qsub_calls, runs)):
+            if i < len(outputs):
+                qsub_out, qsub_retval = outputs[i]
+                qsub_err = []
+            else:
+                # batch was aborted or timed out before this qsub call finished, treat it as failed
+                qsub_out, qsub_err, qsub_retval = current, err, retval if retval != 0 else -1
+                current = []
+            job_ids.append(self.check_submit_output(qsub_call, name, *run, qsub_out, qsub_err, qsub_retval))
+        return job_ids
+
+    def check_submit_output(self, qsub_call, name, start_id, end_id, step_size, out, err, retval):
+        """
+        :param list[str] qsub_call:
+        :param str name: escaped task name
+        :param int start_id:
+        :param int end_id:
+        :param int step_size:
+        :param list[bytes] out:
+        :param list[bytes] err:
+        :param int retval:
+        :return: job id or None if the submission failed
+        :rtype: str|None
+        """
         job_id = None
         if len(out) == 1:
-            sout = out[0].split()
-            if len(sout) == 7 and sout[3].startswith(b'("') and sout[3].endswith(b'")'):
-                if sout[3][2:-2] != name.encode() and name.encode().startswith(sout[3][2:-2]):
-                    # SGE can cutoff the job-name. Fix that.
-                    ref_output[2] = sout[3]
-            if retval != 0 or len(err) > 0 or len(sout) != 7 or sout[0:2] + sout[3:] != ref_output:
-                print(retval, len(err), len(sout), sout[0:2], sout[3:], ref_output)
+            m = _QSUB_OK.match(out[0])
+            # SGE can cutoff the job-name, so only the start of the name is checked
+            if retval != 0 or len(err) > 0 or m is None or not name.encode().startswith(m.group(3)):
+                print(retval, len(err), out[0])
                 logging.error("Error to submit job")
                 logging.error("QSUB command: %s" % " ".join(qsub_call))
                 for line in out:
@@ -283,14 +499,12 @@ class SonOfGridEngine(EngineBase):
                 # reset cache, after error
                 self.reset_cache()
             else:
-                sjob_id = sout[2].decode().split(".")
-                assert len(sjob_id) == 2
-                assert sjob_id[1] == "%i-%i:%i" % (start_id, end_id, step_size)
-                job_id = sjob_id[0]
+                assert m.group(2).decode() == "%i-%i:%i" % (start_id, end_id, step_size)
+                job_id = m.group(1).decode()
 
                 logging.info("Submitted with job_id: %s %s" % (job_id, name))
-                for task_id in range(start_id, end_id, step_size):
-                    self._task_info_cache[(name, task_id)].append((job_id, "qw"))
+                for task_id in range(start_id, end_id + 1, step_size):
+                    _add_task_info(self._task_info_cache, (name, task_id), (job_id, "qw"))
 
                 if False:  # for debugging
                     logging.warning("Boost job!")
@@ -310,35 +524,47 @@ class SonOfGridEngine(EngineBase):
 
     def reset_cache(self):
         self._task_info_cache_last_update = -10
+        self._poll_interval = gs.WAIT_PERIOD_QUEUE_STATE_MIN
+
+    def _flush_pending_clear(self):
+        """Set all tasks found in error state back to qw with a single qmod call"""
+        if not self._pending_clear:
+            return
+        system_command = ["qmod", "-cj", ",".join(sorted(self._pending_clear))]
+        self._pending_clear = set()
+        try:
+            self.system_call(system_command)
+        except subprocess.TimeoutExpired:
+            # tasks are still in error state and will be cleared after the next qstat call
+            logging.warning(self._system_call_timeout_warn_msg(system_command))
 
     def queue_state(self):
         """Return s list with all currently running tasks in this queue"""
 
-        if time.time() - self._task_info_cache_last_update < 30:
+        if time.time() - self._task_info_cache_last_update < self._poll_interval:
             # use cached value
             return self._task_info_cache
 
-        # get qstat output
-        system_command = ["qstat", "-xml", "-u", getpass.getuser()]
-        while True:
-            try:
-                out, err, retval = self.system_call(system_command)
-                if retval != 0:
-                    logging.warning(self._system_call_error_warn_msg(system_command))
-                    time.sleep(gs.WAIT_PERIOD_QSTAT_PARSING)
-                    continue
-            except subprocess.TimeoutExpired:
-                logging.warning(self._system_call_timeout_warn_msg(system_command))
-                time.sleep(gs.WAIT_PERIOD_SSH_TIMEOUT)
-                continue
-            break
+        self._flush_pending_clear()
 
-        xml_data = "".join(i.decode("utf8") for i in out)
+        # get qstat output
+        system_command = ["qstat", "-xml", "-u", self._username]
+        # keep retrying, an incomplete queue state would cause running tasks to be submitted again
+        out, err, retval = self._retry(system_command, check_retval=True, raw=True)
 
-        # parse qstat output
+        # parse qstat output, each job_list element is dropped again after it was processed
+        task_infos = {}
         try:
-            etree = xml.etree.cElementTree.fromstring(xml_data)
-        except xml.etree.cElementTree.ParseError:
+            root = None
+            for event, job in xml.etree.ElementTree.iterparse(io.BytesIO(out), events=("start", "end")):
+                if root is None:
+                    root = job
+                if event != "end" or job.tag != "job_list":
+                    continue
+                self._add_job_to_task_infos(job, task_infos)
+                job.clear()
+                root.clear()
+        except xml.etree.ElementTree.ParseError:
             logging.warning(
                 "qstat -xml parsing error, retrying\n"
                 "command: %s\n"
@@ -349,62 +575,46 @@ class SonOfGridEngine(EngineBase):
             time.sleep(gs.WAIT_PERIOD_QSTAT_PARSING)
             return self.queue_state()
 
-        task_infos = defaultdict(list)
-        for job in etree.iter("job_list"):
-            job_info = {}
-            for attr in job:
-                text = attr.text
-                if text is not None:
-                    text = text.strip()
-                job_info[attr.tag] = text
-
-            name = job_info["JB_name"].strip()
-            state = job_info["state"].strip()
-            task_ids = job_info.get("tasks", None)
-            job_number = job_info["JB_job_number"].strip()
-
-            def parse_task_ids(string):
-                """
-                Return list with all task ids of this task
-
-                :param str|None string:
-                :rtype: list[int|None]
-                """
-
-                if string is None:
-                    # No task id
-                    return [None]
-
-                try:
-                    # just one task id
-                    return [int(string)]
-                except ValueError:
-                    pass
-
-                if "," in string:
-                    # multiple task ids
-                    tasks_list = []
-                    for i in string.split(","):
-                        tasks_list += parse_task_ids(i)
-                    return tasks_list
-
-                if ":" in string:
-                    # taks list
-                    start_end, step_size = string.split(":")
-                    start, end = start_end.split("-")
-                    return list(range(int(start), int(end) + 1, int(step_size)))
-                logging.warning("Can not parse task: %s : %s" % (str(name), str(string)))
-                return []
-
-            for task_id in parse_task_ids(task_ids):
-                # Check if this task should be ignored, all sisyphus jobs have a task id
-                if task_id is not None and "%s.%i" % (job_number, task_id) not in self.ignore_jobs:
-                    task_infos[(name, task_id)].append((job_number, state))
-
+        # poll less often while nothing changes
+        if task_infos == self._task_info_cache:
+            self._poll_interval = min(self._poll_interval * 2, gs.WAIT_PERIOD_QUEUE_STATE_MAX)
+        else:
+            self._poll_interval = gs.WAIT_PERIOD_QUEUE_STATE_MIN
         self._task_info_cache = task_infos
         self._task_info_cache_last_update = time.time()
         return task_infos
 
+    def _add_job_to_task_infos(self, job, task_infos):
+        """
+        :param xml.etree.ElementTree.Element job: job_list element of the qstat output
+        :param dict[(str,int),(str,str)|list[(str,str)]] task_infos: see _add_task_info
+        """
+        name = job.findtext(_JOB_NAME_TAG, "").strip()
+        state = job.findtext(_STATE_TAG, "").strip()
+        task_ids = job.findtext(_TASKS_TAG)
+        if task_ids is not None:
+            task_ids = task_ids.strip() or None
+        job_number = job.findtext(_JOB_NUMBER_TAG, "").strip()
+        if task_ids is None:
+            # No task id, all sisyphus jobs have a task id
+            return
+        ignored_task_ids = self._ignore_by_job.get(job_number, ())
+        if task_ids.isdigit():
+            # common case of a single task id, skip the generic parser
+            task_id = int(task_ids)
+            if task_id not in ignored_task_ids:
+                _add_task_info(task_infos, (name, task_id), (job_number, state))
+            return
+
+        task_id_list = parse_task_ids(task_ids)
+        if not task_id_list:
+            logging.warning("Can not parse task: %s : %s" % (str(name), str(task_ids)))
+
+        for task_id in task_id_list:
+            # Check if this task should be ignored
+            if task_id not in ignored_task_ids:
+                _add_task_info(task_infos, (name, task_id), (job_number, state))
+
     def task_state(self, task, task_id):
         """Return task state:
         'r' == STATE_RUNNING
@@ -417,16 +627,17 @@ class SonOfGridEngine(EngineBase):
         name = escape_name(name)
         task_name = (name, task_id)
         queue_state = self.queue_state()
-        qs = queue_state[task_name]
+        qs = queue_state.get(task_name)
 
-        # task name should be uniq
-        if len(qs) > 1:
+        if qs is None:
+            return STATE_UNKNOWN
+        if isinstance(qs, list):
+            # task name should be uniq
             logging.warning(
                 "More then one matching SGE task, use first match < %s > matches: %s" % (str(task_name), str(qs))
             )
-
-        if qs == []:
-            return STATE_UNKNOWN
+        else:
+            qs = [qs]
         state = qs[0][1]
         if state in ["r", "t", "Rr", "Rt"]:
             return STATE_RUNNING
@@ -435,7 +646,8 @@ class SonOfGridEngine(EngineBase):
         elif state == "Eqw":
             if self.auto_clean_eqw:
                 logging.info("Clean job in error state: %s, %s, %s" % (name, task_id, qs))
-                self.system_call(["qmod", "-cj", "%s.%s" % (qs[0][0], task_id)])
+                # cleared together with all other tasks in error state before the next qstat call
+                self._pending_clear.add("%s.%s" % (qs[0][0], task_id))
             return STATE_QUEUE_ERROR
         else:
             return STATE_QUEUE_ERROR
@@ -445,8 +657,19 @@ class SonOfGridEngine(EngineBase):
         pass
 
     def stop_engine(self):
-        """No stopping action required with the current implementation"""
-        pass
+        """Clear remaining tasks in error state and close the shared ssh connection to the gateway if there is one"""
+        self._flush_pending_clear()
+        if self._ssh_control_dir is not None:
+            try:
+                subprocess.run(
+                    ["ssh", "-O", "exit", "-o", "ControlPath=%s" % self._ssh_control_path(), self.gateway],
+                    capture_output=True,
+                    timeout=30,
+                )
+            except subprocess.TimeoutExpired:
+                logging.warning(self._system_call_timeout_warn_msg("ssh -O exit"))
+            shutil.rmtree(self._ssh_control_dir, ignore_errors=True)
+            self._ssh_control_dir = None
 
     @staticmethod
     def get_task_id(task_id):
@@ -466,18 +689,41 @@ class SonOfGridEngine(EngineBase):
         # setup log file by linking to engine logfile
         task_id = SonOfGridEngine.get_task_id(None)
         logpath = os.path.relpath(task.path(gs.JOB_LOG, task_id))
-        if os.path.isfile(logpath):
-            os.unlink(logpath)
 
         engine_logpath = os.getenv("SGE_STDERR_PATH")
         try:
-            if os.path.isfile(engine_logpath):
-                os.link(engine_logpath, logpath)
-            else:
-                logging.warning("Could not find engine logfile: %s Create soft link anyway." % engine_logpath)
-                os.symlink(os.path.relpath(engine_logpath, os.path.dirname(logpath)), logpath)
+            self._replace_link(os.link, engine_logpath, logpath)
+        except FileNotFoundError:
+            logging.warning("Could not find engine logfile: %s Create soft link anyway." % engine_logpath)
+            self._replace_link(os.symlink, os.path.relpath(engine_logpath, os.path.dirname(logpath)), logpath)
+
+    @staticmethod
+    def _replace_link(link, src, dst):
+        """
+        Create a link, replacing dst if it already exists. An existing dst is replaced atomically,
+        so dst never disappears while e.g. the manager checks if the task has started.
+
+        :param Callable[[str,str],None] link: os.link or os.symlink
+        :param str src:
+        :param str dst:
+        """
+        try:
+            link(src, dst)
         except FileExistsError:
-            pass
+            tmp = "%s.tmp.%d" % (dst, os.getpid())
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            link(src, tmp)
+            try:
+                os.replace(tmp, dst)
+            finally:
+                # renaming is a no-op if tmp and dst are hard links to the same file, e.g. when relinking a log
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
 
     def get_logpath(self, logpath_base, task_name, task_id):
         """Returns log file for the currently running task"""
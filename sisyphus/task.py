@@ -1,15 +1,50 @@
+import atexit
 import math
 import os
 import logging
 import sys
+import threading
 import time
 from typing import Optional, Union, Any, Sequence, Dict, List
 import subprocess as sp
 from ast import literal_eval
+from multiprocessing.pool import ThreadPool
 
 import sisyphus.tools as tools
 import sisyphus.global_settings as gs
 
+#: States of the task ids of a parallel task ordered by how bad they are, the task gets the worst state of its task ids
+_STATES_BY_PRIORITY = (
+    gs.STATE_ERROR,
+    gs.STATE_QUEUE_ERROR,
+    gs.STATE_INTERRUPTED_RESUMABLE,
+    gs.STATE_INTERRUPTED_NOT_RESUMABLE,
+    gs.STATE_RUNNABLE,
+    gs.STATE_QUEUE,
+    gs.STATE_RUNNING,
+    gs.STATE_RETRY_ERROR,
+    gs.STATE_FINISHED,
+)
+_STATE_PRIORITY = {state: priority for priority, state in enumerate(_STATES_BY_PRIORITY)}
+#: States an engine may report for a single task id
+_VALID_ENGINE_STATES = frozenset((gs.STATE_QUEUE, gs.STATE_QUEUE_ERROR, gs.STATE_RUNNING, gs.STATE_UNKNOWN))
+
+_task_state_pool = None
+_task_state_pool_lock = threading.Lock()
+
+
+def _get_task_state_pool():
+    """
+    :return: thread pool shared by all tasks to check the states of task ids concurrently
+    :rtype: ThreadPool
+    """
+    global _task_state_pool
+    with _task_state_pool_lock:
+        if _task_state_pool is None:
+            _task_state_pool = ThreadPool(gs.TASK_STATE_WORKER)
+            atexit.register(_task_state_pool.close)
+        return _task_state_pool
+
 
 class Task:
     """
@@ -59,8 +94,10 @@ class Task:
         if mini_task:
             self._rqmt["engine"] = "short"
         self._update_rqmt = update_rqmt if update_rqmt else gs.update_engine_rqmt
-        self._args = list(args)
+        self._args = self._wrap_args(args)
         self._parallel = len(self._args) if parallel == 0 else parallel
+        self._arg_ranges = self._get_arg_ranges()
+        self._init_path_caches()
         self.mini_task = mini_task
         self.reset_cache()
         self.last_state = None
@@ -70,6 +107,37 @@ class Task:
     def __repr__(self):
         return "<Task %r job=%r>" % (self._start, getattr(self, "_job", None))
 
+    def __getstate__(self):
+        d = self.__dict__.copy()
+        # these caches depend on the current process, e.g. on the working directory
+        for key in ["_path_cache", "_usage_cache", "_worker_call_base"]:
+            if key in d:
+                del d[key]
+        return d
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # pickles written by older versions contain unwrapped arguments and lack the precomputed argument ranges
+        self._args = self._wrap_args(self._args)
+        if "_arg_ranges" not in state:
+            self._arg_ranges = self._get_arg_ranges()
+        self._init_path_caches()
+
+    def _init_path_caches(self):
+        # job paths don't change once the job is created, (path_type, task_id, abspath) -> path
+        self._path_cache = {}
+        self._usage_cache = {}
+        self._worker_call_base = None
+
+    @staticmethod
+    def _wrap_args(args):
+        """
+        :param Sequence[list[Any]|tuple[Any]|Any] args:
+        :return: args with each single argument wrapped into a list, so they can always be unpacked when calling
+        :rtype: list[list[Any]|tuple[Any]]
+        """
+        return [a if isinstance(a, (list, tuple)) else [a] for a in args]
+
     def reset_cache(self):
         self._state_cache = {}
         self._state_cache_time = {}
@@ -79,6 +147,7 @@ class Task:
         :param sisyphus.job.Job job:
         """
         self._job = job
+        self._init_path_caches()
         for name in self._start, self._resume:
             try:
                 if name is not None:
@@ -106,9 +175,10 @@ class Task:
             rqmt = self._rqmt
 
         # Ensure that the requested memory is a float representing GB
-        if "mem" in rqmt:
+        # the converted values are stored in the dict, values which are already floats don't need to be parsed again
+        if "mem" in rqmt and not isinstance(rqmt["mem"], float):
             rqmt["mem"] = tools.str_to_GB(rqmt["mem"])
-        if "time" in rqmt:
+        if "time" in rqmt and not isinstance(rqmt["time"], float):
             rqmt["time"] = tools.str_to_hours(rqmt["time"])
         return rqmt
 
@@ -132,31 +202,48 @@ class Task:
 
         logging.info("Start Job: %s Task: %s" % (job, self.name()))
         logging.info("Inputs:")
-        for i in sorted(self._job._sis_inputs):
+        # several inputs may point to the same file, only stat each path once
+        stat_cache = {}
+
+        def cached_stat(path):
+            try:
+                return stat_cache[path]
+            except KeyError:
+                st = stat_cache[path] = os.stat(path)
+                return st
+
+        newest_input_mtime = 0
+        input_wait_attempts = (
+            math.ceil(gs.WAIT_PERIOD_FOR_INPUTS_AVAILABLE) if gs.WAIT_PERIOD_FOR_INPUTS_AVAILABLE else 0
+        )
+        for i in sorted(job._sis_inputs):
+            input_path = i.get_path()
             if i.path_type == "Path":
-                logging.info(i.get_path())
+                logging.info(input_path)
             else:
-                logging.info("%s (Variable: %s, %s)" % (i.get_path(), str(i), type(i.get())))
+                logging.info("%s (Variable: %s, %s)" % (input_path, str(i), type(i.get())))
 
-            if gs.WAIT_PERIOD_FOR_INPUTS_AVAILABLE:
-                for _ in range(math.ceil(gs.WAIT_PERIOD_FOR_INPUTS_AVAILABLE)):
-                    if os.path.exists(i.get_path()):
-                        break
-                    logging.warning("Input path does not exist, waiting: %s" % i.get_path())
-                    time.sleep(1)
+            for _ in range(input_wait_attempts):
+                if input_path in stat_cache or os.path.exists(input_path):
+                    break
+                logging.warning("Input path does not exist, waiting: %s" % input_path)
+                time.sleep(1)
 
-            # each input must be at least X seconds old
-            # if an input file is too young it's may not synced in a network filesystem yet
             try:
-                input_age = time.time() - os.stat(i.get_path()).st_mtime
-                time.sleep(max(0, gs.WAIT_PERIOD_MTIME_OF_INPUTS - input_age))
+                newest_input_mtime = max(newest_input_mtime, cached_stat(input_path).st_mtime)
             except FileNotFoundError:
                 (logging.error if gs.TASK_INPUTS_MUST_BE_AVAILABLE else logging.warning)(
-                    "Input path does not exist: %s" % i.get_path()
+                    "Input path does not exist: %s" % input_path
                 )
                 if gs.TASK_INPUTS_MUST_BE_AVAILABLE:
                     raise
 
+        # each input must be at least X seconds old
+        # if an input file is too young it's may not synced in a network filesystem yet
+        # waiting once for the newest input is enough to cover all inputs
+        input_age = time.time() - newest_input_mtime
+        time.sleep(max(0, gs.WAIT_PERIOD_MTIME_OF_INPUTS - input_age))
+
         tools.get_system_informations(sys.stdout)
         sys.stdout.flush()
 
@@ -180,10 +267,8 @@ class Task:
                 # get job arguments
                 for arg_id in self._get_arg_idx_for_task_id(task_id):
                     args = self._args[arg_id]
-                    if not isinstance(args, (list, tuple)):
-                        args = [args]
                     logging.info("-" * 60)
-                    logging.info("Starting subtask for arg id: %d args: %s" % (arg_id, str(args)))
+                    logging.info("Starting subtask for arg id: %d args: %s", arg_id, args)
                     logging.info("-" * 60)
                     f(*args)
         except sp.CalledProcessError as e:
@@ -221,10 +306,14 @@ class Task:
     def task_name(self):
         return "%s.%s" % (self._job._sis_id(), self.name())
 
-    def path(self, path_type=None, task_id=None):
-        if path_type not in (None, gs.JOB_WORK_DIR, gs.JOB_SAVE, gs.JOB_LOG_ENGINE):
-            path_type = "%s.%s" % (path_type, self.name())
-        return self._job._sis_path(path_type, task_id)
+    def path(self, path_type=None, task_id=None, abspath=False):
+        key = (path_type, task_id, abspath)
+        path = self._path_cache.get(key)
+        if path is None:
+            if path_type not in (None, gs.JOB_WORK_DIR, gs.JOB_SAVE, gs.JOB_LOG_ENGINE):
+                path_type = "%s.%s" % (path_type, self.name())
+            path = self._path_cache[key] = self._job._sis_path(path_type, task_id, abspath=abspath)
+        return path
 
     def check_state(self, state, task_id=None, update=None, combine=all, minimal_time_since_change=0):
         """
@@ -274,23 +363,28 @@ class Task:
             self.check_state(gs.STATE_ERROR, task_id, update=update, combine=any)
             return True
         if isinstance(task_id, int):
-            task_ids = [task_id]
+            task_ids = (task_id,)
         elif task_id is None:
-            task_ids = self.task_ids()
+            task_ids = range(1, self._parallel + 1)
         elif isinstance(task_id, list):
             task_ids = task_id
         else:
             raise Exception("unexpected task_id %r" % (task_id,))
 
-        assert isinstance(task_ids, list)
+        if len(task_ids) > 1:
+            # a single directory scan is cheaper than checking each error file separately
+            error_task_ids = self._error_task_ids()
+            if not error_task_ids:
+                return False
+            task_ids = (task_id for task_id in task_ids if task_id in error_task_ids)
 
         for task_id in task_ids:
-            error_file = self._job._sis_path(gs.STATE_ERROR + "." + self.name(), task_id)
+            error_file = self.path(gs.STATE_ERROR, task_id)
             error_file = os.path.realpath(error_file)
             if os.path.isfile(error_file):  # task is in error state
                 # move log file and remove error file if a usued try is left
                 for i in range(1, self.tries):
-                    log_file = self._job._sis_path(gs.JOB_LOG + "." + self.name(), task_id)
+                    log_file = self.path(gs.JOB_LOG, task_id)
                     new_name = "%s.error.%02i" % (log_file, i)
                     if not os.path.isfile(new_name):
                         if os.path.isfile(log_file):
@@ -303,6 +397,24 @@ class Task:
                 return True
         return False
 
+    def _error_task_ids(self):
+        """
+        :return: ids of all tasks which currently have an error file
+        :rtype: set[int]
+        """
+        prefix = "%s.%s." % (gs.STATE_ERROR, self.name())
+        task_ids = set()
+        try:
+            with os.scandir(self.path()) as it:
+                for entry in it:
+                    if entry.name.startswith(prefix):
+                        suffix = entry.name[len(prefix) :]
+                        if suffix.isdigit() and entry.is_file():
+                            task_ids.add(int(suffix))
+        except FileNotFoundError:
+            pass
+        return task_ids
+
     def started(self, task_id=None):
         """True if job execution has started"""
         path = self.path(gs.JOB_LOG, task_id)
@@ -346,29 +458,26 @@ class Task:
             # Task is not finished and not in error state, time to check the engine
             if task_id is None:
                 # Check all task_id of this task, return the 'worst' state
-                engine_states = [self.state(engine, i) for i in self.task_ids()]
-                for engine_state in (
-                    gs.STATE_ERROR,
-                    gs.STATE_QUEUE_ERROR,
-                    gs.STATE_INTERRUPTED_RESUMABLE,
-                    gs.STATE_INTERRUPTED_NOT_RESUMABLE,
-                    gs.STATE_RUNNABLE,
-                    gs.STATE_QUEUE,
-                    gs.STATE_RUNNING,
-                    gs.STATE_RETRY_ERROR,
-                    gs.STATE_FINISHED,
-                ):
-                    if engine_state in engine_states:
-                        return engine_state
+                task_ids = self.task_ids()
+                if gs.TASK_STATE_WORKER > 1 and len(task_ids) > 1:
+                    engine_states = _get_task_state_pool().map(lambda i: self.state(engine, i), task_ids)
+                else:
+                    engine_states = [self.state(engine, i) for i in task_ids]
+                priorities = [_STATE_PRIORITY[s] for s in set(engine_states) if s in _STATE_PRIORITY]
+                if priorities:
+                    return _STATES_BY_PRIORITY[min(priorities)]
                 logging.critical("Could not determine state of task: %s" % str(engine_states))
                 assert False  # This code point should be unreachable
             else:
                 # check state for the given task id
+                # a started task stays started, so a positive result can be reused for the rest of this call.
+                # finished and error are checked again on purpose since they may change while querying the engine
+                started = False
                 if engine is None:
                     engine_state = gs.STATE_UNKNOWN
                 else:
                     engine_state = engine.task_state(self, task_id)
-                    assert engine_state in (gs.STATE_QUEUE, gs.STATE_QUEUE_ERROR, gs.STATE_RUNNING, gs.STATE_UNKNOWN)
+                    assert engine_state in _VALID_ENGINE_STATES, engine_state
 
                     # force cache update to avoid caching problems if last state was not also UNKNOWN
                     if (
@@ -377,17 +486,13 @@ class Task:
                         and self.last_state != gs.STATE_UNKNOWN
                         and self.started(task_id)
                     ):
+                        started = True
                         engine.reset_cache()
                         engine_state = engine.task_state(self, task_id)
-                        assert engine_state in (
-                            gs.STATE_QUEUE,
-                            gs.STATE_QUEUE_ERROR,
-                            gs.STATE_RUNNING,
-                            gs.STATE_UNKNOWN,
-                        )
+                        assert engine_state in _VALID_ENGINE_STATES, engine_state
 
                 if engine_state == gs.STATE_UNKNOWN:
-                    if self.started(task_id):
+                    if started or self.started(task_id):
                         # check again if it finished or crashed while retrieving the state
                         if self.finished(task_id):
                             return gs.STATE_FINISHED
@@ -422,31 +527,43 @@ class Task:
         """
         :return: True if usage file changed recently, None if usage file doesn't exist False otherwise
         """
-        usage_file = self._job._sis_path(gs.PLOGGING_FILE + "." + self.name(), task_id, abspath=True)
+        usage_file = self.get_process_logging_path(task_id)
         maximal_file_age = gs.WAIT_PERIOD_JOB_FS_SYNC + gs.PLOGGING_UPDATE_FILE_PERIOD + gs.WAIT_PERIOD_JOB_CLEANUP
-        if not os.path.isfile(usage_file):
+        usage_mtime = tools.file_mtime(usage_file)
+        if usage_mtime is None:
             return None
-        if maximal_file_age > time.time() - os.path.getmtime(usage_file):
+        if maximal_file_age > time.time() - usage_mtime:
             return True
 
-        log_file = self._job._sis_path(gs.JOB_LOG + "." + self.name(), task_id)
-        return os.path.isfile(log_file) and maximal_file_age > time.time() - os.path.getmtime(log_file)
+        log_mtime = tools.file_mtime(self.path(gs.JOB_LOG, task_id))
+        return log_mtime is not None and maximal_file_age > time.time() - log_mtime
+
+    def _get_arg_ranges(self):
+        """
+        Split the arguments into `_parallel` consecutive chunks, the first `len(_args) % _parallel` chunks
+        get one additional argument.
+
+        :return: the range of argument indices for each task, the entry at index i belongs to task id i + 1
+        :rtype: list[range]
+        """
+        if self._parallel == 0:
+            return []
+        chunk_size, overflow = divmod(len(self._args), self._parallel)
+        arg_ranges = []
+        start = 0
+        for task_idx in range(self._parallel):
+            stop = start + chunk_size + (1 if task_idx < overflow else 0)
+            arg_ranges.append(range(start, stop))
+            start = stop
+        return arg_ranges
 
     def _get_arg_idx_for_task_id(self, task_id):
         """
         :param int task_id:
-        :rtype: list[int]
+        :rtype: range
         """
         assert task_id > 0, "this function assumes task_ids start at 1"
-        nargs = len(self._args)
-        chunk_size = nargs // self._parallel
-        overflow = nargs % self._parallel
-        if task_id - 1 < overflow:
-            start = (chunk_size + 1) * (task_id - 1)
-            return range(start, start + chunk_size + 1)
-        else:
-            start = (chunk_size + 1) * overflow + chunk_size * (task_id - 1 - overflow)
-            return range(start, start + chunk_size)
+        return self._arg_ranges[task_id - 1]
 
     def update_rqmt(self, last_rqmt, task_id):
         """Update task requirements of interrupted job"""
@@ -454,17 +571,33 @@ class Task:
         # Make sure mem and time are numbers and not str
         last_rqmt["mem"] = tools.str_to_GB(last_rqmt["mem"])
         last_rqmt["time"] = tools.str_to_hours(last_rqmt["time"])
-        usage_file = self._job._sis_path(gs.PLOGGING_FILE + "." + self.name(), task_id, abspath=True)
+        usage_file = self.get_process_logging_path(task_id)
 
         try:
-            last_usage = literal_eval(open(usage_file).read())
+            last_usage = self._read_usage_file(usage_file)
         except (SyntaxError, IOError):
             # we don't know anything if no usage file is writen or is invalid, just reuse last rqmts
             return last_rqmt
         return self._update_rqmt(last_rqmt=last_rqmt, last_usage=last_usage)
 
+    def _read_usage_file(self, usage_file):
+        """
+        Parse the given usage file, the parsed content is reused as long as the file is not modified.
+
+        :param str usage_file:
+        :return: copy of the parsed usage information
+        :rtype: dict[str]
+        """
+        st = os.stat(usage_file)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._usage_cache.get(usage_file)
+        if cached is None or cached[0] != key:
+            with open(usage_file) as f:
+                cached = self._usage_cache[usage_file] = (key, literal_eval(f.read()))
+        return cached[1].copy()
+
     def get_process_logging_path(self, task_id):
-        return self._job._sis_path(gs.PLOGGING_FILE + "." + self.name(), task_id, abspath=True)
+        return self.path(gs.PLOGGING_FILE, task_id, abspath=True)
 
     def __str__(self):
         return "Task < workdir(%s) name(%s) ids(%s) >" % (
@@ -474,11 +607,16 @@ class Task:
         )
 
     def get_worker_call(self, task_id=None):
-        if isinstance(gs.SIS_COMMAND, list):
-            call = gs.SIS_COMMAND[:]
-        else:
-            call = gs.SIS_COMMAND.split()
-        call += [gs.CMD_WORKER, os.path.relpath(self.path()), self.name()]
+        # the base call only changes if SIS_COMMAND or the current directory changes
+        key = (tuple(gs.SIS_COMMAND) if isinstance(gs.SIS_COMMAND, list) else gs.SIS_COMMAND, os.getcwd())
+        if self._worker_call_base is None or self._worker_call_base[0] != key:
+            if isinstance(gs.SIS_COMMAND, list):
+                call = gs.SIS_COMMAND[:]
+            else:
+                call = gs.SIS_COMMAND.split()
+            call += [gs.CMD_WORKER, os.path.relpath(self.path()), self.name()]
+            self._worker_call_base = (key, call)
+        call = self._worker_call_base[1][:]
         if task_id is not None:
             call.append(str(task_id))
         if hasattr(self, "_job"):
@@ -38,17 +38,25 @@ Useful examples::
     tk.cleaner?
 """
 
+import copy
 import glob
 import gzip
+import io
 import logging
 import os
 import pickle
 import shutil
-import tarfile
 import tempfile
+import threading
 from typing import Union, Any, List, Optional
 import subprocess
 import importlib
+from multiprocessing.pool import ThreadPool
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
 
 from sisyphus.tools import sh, extract_paths
 import sisyphus.block
@@ -69,6 +77,13 @@ class BlockedWorkflow(Exception):
     pass
 
 
+# Buffer size used when pickling to and from (zipped) files, larger buffers result in fewer read/write calls
+_PICKLE_BUFFER_SIZE = 128 * 1024
+# Magic numbers at the start of compressed files
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
 # Functions mainly useful in Job definitions
 def zipped(filename: Union[Path, str]) -> bool:
     """Check if given file is zipped
@@ -76,7 +91,7 @@ def zipped(filename: Union[Path, str]) -> bool:
     :param filename (Path/str): File to be checked
     :return (bool): True if input file is zipped"""
     with open(str(filename), "rb") as f:
-        return f.read(2) == b"\x1f\x8b"
+        return f.read(2) == _GZIP_MAGIC
 
 
 class mktemp:
@@ -210,14 +225,23 @@ class RelPath:
     def __init__(self, origin, hash_overwrite=None):
         self.origin = origin
         self.hash_overwrite = hash_overwrite
+        # (path, current directory) -> (resolved path, hash overwrite), the same paths are often created many times
+        self._cache = {}
 
     def __call__(self, path: str, *args, **kwargs) -> Path:
-        if self.hash_overwrite and "hash_overwrite" not in kwargs and len(args) < 3:
-            kwargs["hash_overwrite"] = os.path.join(self.hash_overwrite, path)
-        if not os.path.isabs(path):
-            path = os.path.join(self.origin, path)
-            path = os.path.relpath(path)
-        return Path(path, *args, **kwargs)
+        key = (path, os.getcwd())
+        try:
+            resolved_path, hash_overwrite = self._cache[key]
+        except KeyError:
+            hash_overwrite = os.path.join(self.hash_overwrite, path) if self.hash_overwrite else None
+            if os.path.isabs(path):
+                resolved_path = path
+            else:
+                resolved_path = os.path.relpath(os.path.join(self.origin, path))
+            self._cache[key] = resolved_path, hash_overwrite
+        if hash_overwrite and "hash_overwrite" not in kwargs and len(args) < 3:
+            kwargs["hash_overwrite"] = hash_overwrite
+        return Path(resolved_path, *args, **kwargs)
 
 
 def setup_path(package: str) -> RelPath:
@@ -252,21 +276,49 @@ def dump(obj: Any, filename: str):
     :param str filename: path to pickled file
     """
     outfile_dir = os.path.dirname(filename)
-    if not os.path.isdir(outfile_dir):
-        os.makedirs(outfile_dir)
-    with gzip.open(filename, "wb") as f:
-        pickle.dump(obj, f)
+    if outfile_dir:
+        os.makedirs(outfile_dir, exist_ok=True)
+    if gs.DUMP_COMPRESSION == "zstd":
+        assert zstandard is not None, "DUMP_COMPRESSION = 'zstd' requires the zstandard module"
+        with open(filename, "wb") as raw:
+            with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(raw) as f:
+                pickle.dump(obj, f, protocol=gs.PICKLE_PROTOCOL)
+    else:
+        assert gs.DUMP_COMPRESSION == "gzip", "Unknown DUMP_COMPRESSION: %s" % gs.DUMP_COMPRESSION
+        with gzip.open(filename, "wb", compresslevel=6) as g:
+            with io.BufferedWriter(g, buffer_size=_PICKLE_BUFFER_SIZE) as f:
+                pickle.dump(obj, f, protocol=gs.PICKLE_PROTOCOL)
 
 
 def load_file(path: str) -> Any:
-    """Load object from pickled file, works with zipped and unzipped files
+    """Load object from pickled file, works with gzip or zstd compressed and uncompressed files
 
     :param str path: path to pickled file
     :return: unpickled object
     """
-    fopen = gzip.open(path, "rb") if zipped(path) else open(path, "rb")
-    with fopen as f:
-        return pickle.load(f)
+    with open(path, "rb", buffering=_PICKLE_BUFFER_SIZE) as f:
+        return _load_pickle_stream(f, path)
+
+
+def _load_pickle_stream(f, name):
+    """Unpickle object from an open file, gzip and zstd compressed data is decompressed while reading
+
+    :param io.BufferedReader f: file opened in binary mode
+    :param str name: name of the file, used for error messages
+    :return: unpickled object
+    """
+    # check for the magic numbers without reading from the file
+    magic = f.peek(4)[:4]
+    if magic[:2] == _GZIP_MAGIC:
+        with gzip.GzipFile(fileobj=f, mode="rb") as g:
+            with io.BufferedReader(g, buffer_size=_PICKLE_BUFFER_SIZE) as buffered:
+                return pickle.load(buffered)
+    if magic == _ZSTD_MAGIC:
+        assert zstandard is not None, "%s is zstd compressed, loading it requires the zstandard module" % name
+        with zstandard.ZstdDecompressor().stream_reader(f) as z:
+            with io.BufferedReader(z, buffer_size=_PICKLE_BUFFER_SIZE) as buffered:
+                return pickle.load(buffered)
+    return pickle.load(f)
 
 
 _sis_running_in_worker = False
@@ -286,9 +338,12 @@ def load_job(path: str) -> Job:
     """
 
     def load_tar(filename):
+        import tarfile
+
+        # stream the compressed job from the archive instead of keeping the compressed and uncompressed data in memory
         with tarfile.open(filename) as tar:
-            with tar.extractfile(gs.JOB_SAVE) as f:
-                return pickle.loads(gzip.decompress(f.read()))
+            with tar.extractfile(gs.JOB_SAVE) as member:
+                return _load_pickle_stream(member, "%s:%s" % (filename, gs.JOB_SAVE))
 
     if os.path.isfile(path):
         if path.endswith(gs.JOB_FINISHED_ARCHIVE):
@@ -361,8 +416,6 @@ def run_job(job: Job, task_name: str = None, task_id: int = 1, force_resume: boo
         call = task.get_worker_call(task_id)
         if force_resume:
             call.append("--force_resume")
-        import subprocess
-
         process = subprocess.Popen(call)
         try:
             process.wait()
@@ -395,6 +448,7 @@ def remove_job_and_descendants(
     if isinstance(jobs, (str, AbstractPath, Job)):
         jobs = [jobs]
 
+    sources = []
     for source in jobs:
         # Make sure source is a string matching the _sis_contains_required_inputs pattern
         if isinstance(source, AbstractPath):
@@ -404,20 +458,25 @@ def remove_job_and_descendants(
 
         assert isinstance(source, str), "Source is not string, Path, or Job it is: %s" % type(source)
         print("Check for %s" % source)
+        sources.append(source)
 
-        def add_if_dependened(job):
-            # check for new inputs
-            job._sis_runnable()
-            if job._sis_contains_required_inputs({source}, include_job_path=True):
-                if os.path.isdir(job._sis_path()):
-                    delete_list.append(job)
-                else:
-                    not_setup_list.append(job)
-                return True
+    def add_if_dependened(job):
+        # check for new inputs
+        job._sis_runnable()
+        # collecting all inputs walks through all ancestors of the job, only do it once for all sources
+        inputs = job._sis_get_all_inputs(include_job_path=True)
+        if any(source in inputs or source in job._sis_outputs for source in sources):
+            if os.path.isdir(job._sis_path()):
+                delete_list.append(job)
             else:
-                return False
+                not_setup_list.append(job)
+            return True
+        else:
+            return False
 
-        sis_graph.for_all_nodes(add_if_dependened, bottom_up=False)
+    # check all sources in a single pass over the graph,
+    # the inputs of a job not depending on any source can't depend on them either
+    sis_graph.for_all_nodes(add_if_dependened, bottom_up=False)
 
     if not delete_list:
         if not not_setup_list:
@@ -428,13 +487,12 @@ def remove_job_and_descendants(
             print(job._sis_path())
         return
 
-    delete_list = sorted(list(set(delete_list)))
+    delete_list = sorted(dict.fromkeys(delete_list), key=lambda job: job._sis_id())
 
     print("Deleting the following directories:")
     for job in delete_list:
-        path = job._sis_path()
-        if os.path.isdir(path):
-            print(path)
+        # only jobs with an existing directory were added to the delete list
+        print(job._sis_path())
     if mode != "dryrun":
         input_var = input("Start deleting? (y/N): ")
         if input_var == "y":
@@ -459,21 +517,38 @@ def import_work_directory(directories: Union[str, List[str]], mode="dryrun", use
     if isinstance(directories, str):
         directories = [directories]
 
+    # jobs which are runnable and setup won't change anymore and don't need to be checked again in the following passes
+    done_jobs = set()
+    seen_jobs = set()
+
     def import_directory(job):
+        seen_jobs.add(job)
+        if job in done_jobs:
+            return True
         # check for new inputs
-        job._sis_runnable()
+        runnable = job._sis_runnable()
         # import work directory if job is not already setup
         if not job._sis_setup():
             job._sis_import_from_dirs(directories, mode=mode, use_alias=use_alias)
+        if runnable and job._sis_setup():
+            done_jobs.add(job)
         return True
 
-    number_of_jobs = 0
     # run once before to unsure inputs are updated at least once
+    targets_version = sis_graph.targets_version
     sis_graph.for_all_nodes(import_directory, bottom_up=True)
-    # run until no new jobs are added. This could be solved more efficient, but this is works...
-    while number_of_jobs != len(sis_graph.jobs()):
-        number_of_jobs = len(sis_graph.jobs())
-        sis_graph.for_all_nodes(import_directory, bottom_up=True)
+    # run until no new jobs are added. Only jobs which are not done yet can get new inputs, so only they and their
+    # inputs are checked again. The whole graph is only checked again if new targets were added
+    while True:
+        number_of_jobs = len(seen_jobs)
+        if targets_version != sis_graph.targets_version:
+            targets_version = sis_graph.targets_version
+            nodes = None
+        else:
+            nodes = [job for job in seen_jobs if job not in done_jobs]
+        sis_graph.for_all_nodes(import_directory, nodes=nodes, bottom_up=True)
+        if number_of_jobs == len(seen_jobs):
+            break
 
 
 def cached_engine(cache=[]):
@@ -519,24 +594,24 @@ def job_info(job: Job):
     for k, v in job._sis_kwargs.items():
         print("  %s : %s" % (k, str(v)))
 
-    print("Inputs:")
+    # extract all paths once and split them into inputs and outputs
+    inputs = []
+    outputs = []
     for name, value in job.__dict__.items():
         if not name.startswith("_sis_"):
-            paths = tools.extract_paths(value)
-            for path in paths:
-                if path.creator is not job:
-                    if path.creator is None:
-                        print("  %s : %s" % (name, path.path))
-                    else:
-                        print("  %s : %s %s" % (name, path.creator._sis_id(), path.path))
+            for path in tools.extract_paths(value):
+                (outputs if path.creator is job else inputs).append((name, path))
+
+    print("Inputs:")
+    for name, path in inputs:
+        if path.creator is None:
+            print("  %s : %s" % (name, path.path))
+        else:
+            print("  %s : %s %s" % (name, path.creator._sis_id(), path.path))
 
     print("Outputs:")
-    for name, value in job.__dict__.items():
-        if not name.startswith("_sis_"):
-            paths = tools.extract_paths(value)
-            for path in paths:
-                if path.creator is job:
-                    print("  %s : %s" % (name, path.path))
+    for name, path in outputs:
+        print("  %s : %s" % (name, path.path))
 
     print("Job dir: %s" % os.path.abspath(job._sis_path()))
     print("Work dir: %s" % job._sis_path(gs.WORK_DIR))
@@ -653,76 +728,156 @@ def migrate_graph(input_file=None, work_source=None, mode="dryrun"):
 
 
 #  ### Graph modify and compare functions
+# Leaf types which can't contain other graph objects, checked by exact type
+_ATOMIC_TYPES = frozenset((int, float, complex, bool, str, bytes, bytearray, type(None)))
+
+# All slots of a class including the ones defined in base classes
+_SLOTS_CACHE = {}
+# Marks slots which are not set
+_SLOT_NOT_SET = object()
+# Marks differences already found by compare_graph on its stack
+_FOUND_DIFFERENCE = object()
+
+
+def _get_all_slots(cls):
+    """
+    :param type cls:
+    :return: names of all slots of cls and its base classes
+    :rtype: tuple[str]
+    """
+    try:
+        return _SLOTS_CACHE[cls]
+    except KeyError:
+        pass
+    slots = []
+    for base in reversed(cls.__mro__):
+        base_slots = base.__dict__.get("__slots__", ())
+        if isinstance(base_slots, str):
+            base_slots = (base_slots,)
+        for slot in base_slots:
+            if slot in ("__dict__", "__weakref__"):
+                continue
+            if slot.startswith("__") and not slot.endswith("__"):
+                # private names are mangled
+                slot = "_%s%s" % (base.__name__.lstrip("_"), slot)
+            if slot not in slots:
+                slots.append(slot)
+    slots = tuple(slots)
+    _SLOTS_CACHE[cls] = slots
+    return slots
+
+
+def _graph_key(obj, hash_cache):
+    """
+    Only jobs and paths are identified by their hash so that equal objects are handled once, hashing containers would
+    traverse their whole subgraph on every level. All other objects are identified by their id, the caller has to keep
+    them alive while walking through the graph.
+
+    :param obj:
+    :param dict[int, str] hash_cache: hashes of already seen paths by their id
+    :return: key identifying obj while walking through a graph
+    """
+    if isinstance(obj, Job):
+        # the job id already contains the hash of all job arguments
+        return "job", obj._sis_id()
+    if isinstance(obj, AbstractPath):
+        # the same path object is usually reached many times, it's only hashed once
+        try:
+            return hash_cache[id(obj)]
+        except KeyError:
+            key = hash_cache[id(obj)] = gs.SIS_HASH(obj)
+            return key
+    return id(obj)
+
+
 def compare_graph(obj1, obj2, traceback=None, visited=None):
     """Compares two objects and shows traceback to first found difference
 
     :param obj1 (Job/Path): Object1 to compare
     :param obj2 (Job/Path): Object2 which is compared to Object1
-    :param traceback: Used for recursion, leave blank
-    :param visited: Used for recursion, leave blank
+    :param traceback: Traceback leading to obj1 and obj2, leave blank
+    :param visited: Keys of already compared objects, leave blank
     :return: traceback
     """
 
     visited = set() if visited is None else visited
-
     traceback = [] if traceback is None else traceback
-    traceback.append((obj1, obj2))
-
-    sis_hash = gs.SIS_HASH(obj1)
-    skip = sis_hash in visited
-    if not skip:
-        visited.add(gs.SIS_HASH(obj1))
-
-    if skip:
-        pass
-    elif type(obj1) != type(obj2):
-        yield traceback + [(type(obj1), type(obj2))]
-    elif isinstance(obj1, Job):
-        if obj1._sis_id() != obj2._sis_id():
-            yield from compare_graph(obj1._sis_kwargs, obj2._sis_kwargs, traceback[:], visited)
-    elif isinstance(obj1, AbstractPath):
-        if obj1.path != obj2.path:
-            yield traceback + [(obj1.path, obj2.path)]
-        else:
-            yield from compare_graph(obj1.creator, obj2.creator, traceback[:], visited)
-    elif isinstance(obj1, (list, tuple, set)):
-        if len(obj1) != len(obj2):
-            yield traceback + [len(obj1), len(obj2)]
-        else:
-            if isinstance(obj1, set):
-                obj1 = sorted(list(obj1))
-                obj2 = sorted(list(obj2))
-            for a, b in zip(obj1, obj2):
-                yield from compare_graph(a, b, traceback[:], visited)
-    elif isinstance(obj1, dict):
-        for k, v1 in obj1.items():
-            try:
-                v2 = obj2[k]
-            except KeyError:
-                yield traceback + [(k, None)]
+    hash_cache = {}
+
+    # The graph is walked with an explicit stack instead of recursion, deep graphs would otherwise exceed the recursion
+    # limit. Entries are pairs of objects to compare or already found differences, children are pushed in reverse
+    # order to report differences in the same order as a recursive depth first search
+    stack = [(obj1, obj2, traceback)]
+    while stack:
+        obj1, obj2, traceback = stack.pop()
+        if obj1 is _FOUND_DIFFERENCE:
+            yield obj2
+            continue
+        traceback = traceback + [(obj1, obj2)]
+
+        if type(obj1) in _ATOMIC_TYPES:
+            # leaves are compared directly, equal values share their id and must not be skipped as already visited
+            if type(obj1) != type(obj2):
+                yield traceback + [(type(obj1), type(obj2))]
+            elif obj1 != obj2:
+                yield traceback
+            continue
+
+        # all objects are part of the compared graph and stay alive
+        key = _graph_key(obj1, hash_cache)
+        if key in visited:
+            continue
+        visited.add(key)
+
+        children = []
+        if type(obj1) != type(obj2):
+            yield traceback + [(type(obj1), type(obj2))]
+        elif isinstance(obj1, Job):
+            if obj1._sis_id() != obj2._sis_id():
+                children.append((obj1._sis_kwargs, obj2._sis_kwargs))
+        elif isinstance(obj1, AbstractPath):
+            if obj1.path != obj2.path:
+                yield traceback + [(obj1.path, obj2.path)]
             else:
-                yield from compare_graph(v1, v2, traceback[:], visited)
-
-        for k, v2 in obj2.items():
-            if k not in obj1:
-                yield traceback + [(None, k)]
-    elif hasattr(obj1, "__dict__"):
-        yield from compare_graph(obj1.__dict__, obj2.__dict__, traceback[:], visited)
-    elif hasattr(obj1, "__slots__"):
-        for k in obj1.__slots__:
-            if hasattr(obj1, k):
-                if hasattr(obj2, k):
-                    v1 = getattr(obj1, k)
-                    v2 = getattr(obj2, k)
-                    yield from compare_graph(v1, v2, traceback[:], visited)
-                else:
-                    yield traceback + [(k, None)]
+                children.append((obj1.creator, obj2.creator))
+        elif isinstance(obj1, (list, tuple, set)):
+            if len(obj1) != len(obj2):
+                yield traceback + [len(obj1), len(obj2)]
             else:
-                if hasattr(obj2, k):
-                    yield traceback + [(None, k)]
-    else:
-        if obj1 != obj2:
-            yield traceback[:]
+                if isinstance(obj1, set):
+                    obj1 = sorted(list(obj1))
+                    obj2 = sorted(list(obj2))
+                children.extend(zip(obj1, obj2))
+        elif isinstance(obj1, dict):
+            for k, v1 in obj1.items():
+                try:
+                    v2 = obj2[k]
+                except KeyError:
+                    children.append((_FOUND_DIFFERENCE, traceback + [(k, None)]))
+                else:
+                    children.append((v1, v2))
+
+            for k, v2 in obj2.items():
+                if k not in obj1:
+                    children.append((_FOUND_DIFFERENCE, traceback + [(None, k)]))
+        elif hasattr(obj1, "__dict__"):
+            children.append((obj1.__dict__, obj2.__dict__))
+        elif hasattr(obj1, "__slots__"):
+            for k in _get_all_slots(type(obj1)):
+                v1 = getattr(obj1, k, _SLOT_NOT_SET)
+                v2 = getattr(obj2, k, _SLOT_NOT_SET)
+                if v1 is _SLOT_NOT_SET:
+                    if v2 is not _SLOT_NOT_SET:
+                        children.append((_FOUND_DIFFERENCE, traceback + [(None, k)]))
+                elif v2 is _SLOT_NOT_SET:
+                    children.append((_FOUND_DIFFERENCE, traceback + [(k, None)]))
+                else:
+                    children.append((v1, v2))
+        else:
+            if obj1 != obj2:
+                yield traceback
+        for child1, child2 in reversed(children):
+            stack.append((child1, child2, traceback))
 
 
 def replace_graph_objects(current, mapping=None, replace_function=None):
@@ -745,61 +900,144 @@ def replace_graph_objects(current, mapping=None, replace_function=None):
         assert mapping is not None
         replace_function = replace_function_mapping
 
-    return _replace_graph_objects_helper(current, replace_function)
+    return _replace_graph_objects_helper(current, replace_function)[0]
 
 
 def _replace_graph_objects_helper(current, replace_function=None, visited=None):
+    """
+    Walks through the graph with an explicit stack instead of recursion, deep graphs would otherwise exceed the
+    recursion limit. Each object with children is handled by a generator which yields its children and receives their
+    results.
+
+    :return: the replaced object and whether it differs from current. Unchanged parts of the graph are returned as
+        they are, so only objects on the path to a replaced object are recreated.
+    :rtype: (object, bool)
+    """
     visited = {} if visited is None else visited
-    sis_hash = gs.SIS_HASH(current)
+    hash_cache = {}
+    result = _replace_graph_objects_start(current, replace_function, visited, hash_cache)
+    stack = []
+    while True:
+        if not isinstance(result, tuple):
+            # start walking through the children of a new object
+            stack.append(result)
+            result = None
+        if not stack:
+            return result
+        try:
+            child = stack[-1].send(result)
+        except StopIteration as e:
+            stack.pop()
+            result = e.value
+        else:
+            result = _replace_graph_objects_start(child, replace_function, visited, hash_cache)
+
+
+def _replace_graph_objects_start(current, replace_function, visited, hash_cache):
+    """
+    :return: the replaced object and whether it changed if this is already known, otherwise a generator walking through
+        the children of current
+    :rtype: (object, bool)|typing.Generator
+    """
+    if type(current) in _ATOMIC_TYPES:
+        # nothing to traverse or share, only the replace function needs to be applied
+        replace = replace_function(current)
+        return replace, replace != current
+    # Equal jobs and paths share the same replacement. The object is stored together with its replacement to make
+    # sure the id is not reused while the graph is walked
+    key = _graph_key(current, hash_cache)
     try:
-        return visited[sis_hash]
+        _, next, changed = visited[key]
+        return next, changed
     except KeyError:
         pass
 
     replace = replace_function(current)
     if replace != current:
-        visited[sis_hash] = replace
-        return replace
+        visited[key] = (current, replace, True)
+        return replace, True
+    # Placeholder while the children are processed, a reference cycle back to this object keeps the original object
+    visited[key] = (current, current, False)
+    return _replace_graph_objects_children(current, key, visited)
+
+
+def _replace_graph_objects_children(current, key, visited):
+    """
+    Yields all children of current and receives their replacement, returns the replaced object once all are done
 
+    :rtype: typing.Generator
+    """
+    next = current
     if isinstance(current, Job):
-        kwargs = _replace_graph_objects_helper(current._sis_kwargs, replace_function, visited)
-        next = type(current)(**kwargs)
+        kwargs, changed = yield current._sis_kwargs
+        if changed:
+            next = type(current)(**kwargs)
     elif isinstance(current, AbstractPath):
-        creator = _replace_graph_objects_helper(current.creator, replace_function, visited)
-        # TODO tage care of other attributes
-        next = type(current)(current.path, creator)
-    elif isinstance(current, (list, tuple, set)):
-        next = type(current)(_replace_graph_objects_helper(i, replace_function, visited) for i in current)
+        creator, changed = yield current.creator
+        if changed:
+            # TODO tage care of other attributes
+            next = type(current)(current.path, creator)
+    elif isinstance(current, (list, tuple, set, frozenset)):
+        values = []
+        changed = False
+        for i in current:
+            i, i_changed = yield i
+            changed = changed or i_changed
+            values.append(i)
+        if changed:
+            if type(current) is list:
+                next = values
+            elif isinstance(current, tuple) and hasattr(current, "_fields"):
+                # namedtuples take their values as separate arguments
+                next = type(current)(*values)
+            else:
+                next = type(current)(values)
     elif isinstance(current, dict):
-        next = type(current)(
-            (k, _replace_graph_objects_helper(v, replace_function, visited)) for k, v in current.items()
-        )
-    elif hasattr(current, "__dict__"):
+        changes = []
+        for k, v in current.items():
+            v, v_changed = yield v
+            if v_changed:
+                changes.append((k, v))
+        changed = bool(changes)
+        if changed:
+            # copying keeps the stored key hashes and the attributes of dict subclasses like defaultdict
+            next = current.copy() if type(current) is dict else copy.copy(current)
+            for k, v in changes:
+                next[k] = v
+    elif hasattr(current, "__dict__") or hasattr(current, "__slots__"):
         # TODO may add usage of get an set state
-        dict_ = _replace_graph_objects_helper(current.__dict__, replace_function, visited)
-        if dict_ == current.__dict__:
-            next = current
-        else:
-            next = type(current).__new__(type(current))
-            next.__dict__ = dict_
-    elif hasattr(current, "__slots__"):
-        diff = False
-        dict_ = {}
-        for k in current.__slots__:
-            if hasattr(current, k):
-                v = getattr(current, k)
-                new = _replace_graph_objects_helper(v, replace_function, visited)
-                diff = diff or v != new
-        if diff:
-            next = current
-        else:
+        # An object can have slots and a __dict__ at the same time if only some classes in its MRO define slots
+        slots = _get_all_slots(type(current))
+        values = []
+        changed = False
+        for k in slots:
+            v = getattr(current, k, _SLOT_NOT_SET)
+            if v is not _SLOT_NOT_SET:
+                v, v_changed = yield v
+                changed = changed or v_changed
+            values.append(v)
+        # the instance dict is walked here directly instead of passing it through the dict branch.
+        # Classes only have a read-only mappingproxy, it is not replaced
+        dict_ = getattr(current, "__dict__", None)
+        dict_changes = []
+        if type(dict_) is dict:
+            for k, v in dict_.items():
+                v, v_changed = yield v
+                if v_changed:
+                    dict_changes.append((k, v))
+            changed = changed or bool(dict_changes)
+        if changed:
             next = type(current).__new__(type(current))
-            for k, v in dict_:
-                setattr(next, k, v)
+            if type(dict_) is dict:
+                next.__dict__ = dict_.copy()
+                next.__dict__.update(dict_changes)
+            for k, v in zip(slots, values):
+                if v is not _SLOT_NOT_SET:
+                    object.__setattr__(next, k, v)
     else:
-        next = current
-    visited[sis_hash] = next
-    return next
+        changed = False
+    visited[key] = (current, next, changed)
+    return next, changed
 
 
 # Reload functions
@@ -807,9 +1045,19 @@ def _reload_prefix(prefix):
     import sys
     import importlib
 
-    for name, module in sys.modules.items():
-        if name.startswith(prefix):
-            importlib.reload(module)
+    # collect the modules first, reloading can import new modules and change sys.modules while iterating over it.
+    # Only the package itself and its submodules are matched, not other packages starting with the same name
+    package = prefix + "."
+    modules = [
+        module
+        for name, module in sys.modules.items()
+        if module is not None and (name == prefix or name.startswith(package))
+    ]
+    for module in modules:
+        # namespace packages and compiled extensions have no python source which could have changed
+        if not (getattr(module, "__file__", None) or "").endswith(".py"):
+            continue
+        importlib.reload(module)
 
 
 def reload_recipes():
@@ -912,6 +1160,18 @@ def setup_script_mode():
         gs.ENVIRONMENT_SETTINGS["SIS_%s" % param] = "0"
 
 
+# Job states relevant for run
+_RUN_FILTER_STATES = frozenset(
+    (
+        gs.STATE_WAITING,
+        gs.STATE_RUNNABLE,
+        gs.STATE_INTERRUPTED_RESUMABLE,
+        gs.STATE_INTERRUPTED_NOT_RESUMABLE,
+        gs.STATE_ERROR,
+    )
+)
+
+
 def run(obj: Any, quiet: bool = False):
     """
     Run and setup all jobs that are contained inside object and all jobs that are necessary.
@@ -920,6 +1180,41 @@ def run(obj: Any, quiet: bool = False):
     :param quiet: Do not forward job output do stdout
     :return:
     """
+    # environment used for all tasks started by this call
+    env = os.environ.copy()
+    env.update(gs.ENVIRONMENT_SETTINGS)
+    # limits the worker processes of all jobs run in parallel together to RUN_WORKER
+    process_slots = threading.BoundedSemaphore(gs.RUN_WORKER)
+
+    def start_task(task, task_id):
+        """
+        Start the worker of one task id without waiting for it
+
+        :param sisyphus.task.Task task:
+        :param int task_id:
+        :rtype: subprocess.Popen
+        """
+        call = task.get_worker_call(task_id)
+        if quiet:
+            call.append("--redirect_output")
+            return subprocess.Popen(call, env=env)
+        # stdout is written to the log file, stderr is forwarded to our stdout (fd 1)
+        with open(task.path(gs.JOB_LOG, task_id), "w") as log:
+            return subprocess.Popen(call, stdout=log, stderr=1, env=env)
+
+    def wait_task(task, task_id, process):
+        """
+        Wait until a started task id is done and make sure it finished
+
+        :param sisyphus.task.Task task:
+        :param int task_id:
+        :param subprocess.Popen process:
+        """
+        returncode = process.wait()
+        process_slots.release()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, process.args)
+        assert task.finished(task_id), "Failed to run task %s %s %s" % (task._job, task.name(), task_id)
 
     def run_helper(job):
         """
@@ -932,22 +1227,35 @@ def run(obj: Any, quiet: bool = False):
         if not job._sis_finished():
             logging.info("Run Job: %s" % job)
             job._sis_setup_directory()
-            for task in job._sis_tasks():
-                for task_id in task.task_ids():
-                    if not task.finished(task_id):
-                        if len(job._sis_tasks()) > 1 or len(task.task_ids()) > 1:
+            tasks = job._sis_tasks()
+            for task in tasks:
+                task_ids = task.task_ids()
+                log_task_ids = len(tasks) > 1 or len(task_ids) > 1
+                # running a task id only finishes this id, check all of them once before starting any
+                unfinished_task_ids = [task_id for task_id in task_ids if not task.finished(task_id)]
+                # the task ids of one task are independent, they are started while process slots are free
+                running = []
+                try:
+                    for task_id in unfinished_task_ids:
+                        # only block on the slots if no own worker is running, otherwise parallel jobs which
+                        # hold all slots could wait for each other forever
+                        while not process_slots.acquire(blocking=not running):
+                            wait_task(task, *running.pop(0))
+                        if log_task_ids:
                             logging.info("Run Task: %s %s %s" % (job, task.name(), task_id))
-                        log_file = task.path(gs.JOB_LOG, task_id)
-                        env = os.environ.copy()
-                        env.update(gs.ENVIRONMENT_SETTINGS)
-
-                        call = " ".join(task.get_worker_call(task_id))
-                        if quiet:
-                            call += " --redirect_output"
-                        else:
-                            call += " 2>&1 > %s" % log_file
-                        subprocess.check_call(call, shell=True, env=env)
-                        assert task.finished(task_id), "Failed to run task %s %s %s" % (job, task.name(), task_id)
+                        try:
+                            process = start_task(task, task_id)
+                        except BaseException:
+                            process_slots.release()
+                            raise
+                        running.append((task_id, process))
+                    while running:
+                        wait_task(task, *running.pop(0))
+                finally:
+                    # don't leave workers behind if one of them failed
+                    for _, process in running:
+                        process.wait()
+                        process_slots.release()
 
     # Create fresh graph and add object as report since a report can handle all kinds of objects.
     temp_graph = graph.SISGraph()
@@ -963,18 +1271,16 @@ def run(obj: Any, quiet: bool = False):
     gs.SIS_COMMAND = [sys.executable, "-m", "sisyphus"]
     gs.SKIP_IS_FINISHED_TIMEOUT = True
 
-    def get_jobs():
-        """Helper function to get all relevant jobs"""
-        filter_list = (
-            gs.STATE_WAITING,
-            gs.STATE_RUNNABLE,
-            gs.STATE_INTERRUPTED_RESUMABLE,
-            gs.STATE_INTERRUPTED_NOT_RESUMABLE,
-            gs.STATE_ERROR,
-        )
-        return {k: v for k, v in temp_graph.get_jobs_by_status(skip_finished=True).items() if k in filter_list}
+    def get_jobs(nodes=None):
+        """Helper function to get all relevant jobs
 
-    jobs = get_jobs()
+        :param nodes: only check these jobs and their inputs, defaults to all jobs of the graph
+        :return: all states found and the relevant subset of them
+        """
+        all_states = temp_graph.get_jobs_by_status(nodes=nodes, skip_finished=True)
+        return all_states, {k: v for k, v in all_states.items() if k in _RUN_FILTER_STATES}
+
+    all_states, jobs = get_jobs()
     # Iterate over all runnable jobs until it's done
     while jobs:
         # Collect all jobs that can be run
@@ -989,10 +1295,23 @@ def run(obj: Any, quiet: bool = False):
                     logging.error("Jobs in state %s are: %s" % (k, v))
             raise BlockedWorkflow("Can not finish computation of %s some jobs are blocking" % obj)
 
-        # Actually run the jobs
-        for job in todo_list:
-            run_helper(job)
-        jobs = get_jobs()
+        # Actually run the jobs, all of them are independent of each other
+        if gs.RUN_WORKER > 1 and len(todo_list) > 1:
+            with ThreadPool(gs.RUN_WORKER) as pool:
+                pool.map(run_helper, list(todo_list))
+        else:
+            for job in todo_list:
+                run_helper(job)
+        # Only jobs which were unfinished before can change their state, there is no need to walk through the
+        # finished part of the graph again
+        unfinished = [
+            job
+            for state, state_jobs in all_states.items()
+            if state not in (gs.STATE_INPUT_PATH, gs.STATE_INPUT_MISSING)
+            for job in state_jobs
+            if job not in todo_list
+        ]
+        all_states, jobs = get_jobs(unfinished)
 
     gs.SKIP_IS_FINISHED_TIMEOUT = False
 
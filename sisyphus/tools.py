@@ -14,6 +14,7 @@ import time
 import logging
 import subprocess
 import linecache
+from stat import S_ISREG
 from typing import Set, Any
 
 try:
@@ -240,6 +241,21 @@ def sh(
             return e.output
 
 
+def file_mtime(path):
+    """
+    :param str path:
+    :return: modification time of the given file or None if it is not an existing file, using a single stat call
+    :rtype: float|None
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not S_ISREG(st.st_mode):
+        return None
+    return st.st_mtime
+
+
 def hardlink_or_copy(src, dst, use_symlink_instead_of_copy=False):
     """Emulate coping of directories by using hardlinks, if hardlink fails copy file.
     Recursively creates new directories and creates hardlinks of all source files into these directories
@@ -548,7 +564,7 @@ class FinishedResultsCache:
         if self.changed:
             with open(self.cache_file, "wb") as f:
                 cache = self.cache.copy()
-                pickle.dump(cache, f)
+                pickle.dump(cache, f, protocol=gs.PICKLE_PROTOCOL)
             self.changed = False
 
     def __getitem__(self, key):
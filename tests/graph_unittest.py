@@ -63,6 +63,15 @@ class GraphTest(unittest.TestCase):
             ],
         )
 
+    def test_targets_version(self):
+        graph = get_example_graph()
+        version = graph.targets_version
+        target = next(iter(graph.targets))
+        graph.add_target(target)
+        self.assertEqual(graph.targets_version, version)
+        graph.add_target(OutputPath("test2", target.required_full_list[0]))
+        self.assertEqual(graph.targets_version, version + 1)
+
 
 if __name__ == "__main__":
     unittest.main()
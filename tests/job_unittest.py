@@ -71,6 +71,18 @@ class JobTest(unittest.TestCase):
         self.assertEqual(job._sis_id(), "task/test/Test.f744898e46ca9452ff1889edc988d045")
         Test.sis_hash_exclude = {}
 
+    def test_contains_required_inputs(self):
+        from recipe.task.test import Test
+
+        job1 = Test(text=Path("input_text.gz"))
+        job2 = Test(text=job1.out)
+        job1_path = os.path.join(gs.BASE_DIR, job1._sis_path())
+        text_path = Path("input_text.gz").get_path()
+        self.assertTrue(job2._sis_contains_required_inputs(set()))
+        self.assertTrue(job2._sis_contains_required_inputs({text_path, job1_path}, include_job_path=True))
+        self.assertFalse(job2._sis_contains_required_inputs({job1_path}))
+        self.assertFalse(job1._sis_contains_required_inputs({text_path, "other_text.gz"}))
+
     def test_run(self):
         with execute_in_dir(gs.TEST_DIR):
             from recipe.task.test import Test
@@ -0,0 +1,78 @@
+import unittest
+
+from sisyphus.simple_linux_utility_for_resource_management_engine import (
+    SimpleLinuxUtilityForResourceManagementEngine as SlurmEngine,
+)
+
+
+class SubmitRunsTest(unittest.TestCase):
+    def test_runs(self):
+        self.assertEqual(list(SlurmEngine._runs([1, 2, 3, 5, 7, 9])), [(1, 3, 1), (5, 9, 2)])
+        self.assertEqual(list(SlurmEngine._runs([1, 2, 3, 4])), [(1, 4, 1)])
+        self.assertEqual(list(SlurmEngine._runs([4])), [(4, 4, 1)])
+        self.assertEqual(list(SlurmEngine._runs([1, 5])), [(1, 5, 4)])
+        self.assertEqual(list(SlurmEngine._runs([1, 2, 4, 5])), [(1, 2, 1), (4, 5, 1)])
+        self.assertEqual(list(SlurmEngine._runs([])), [])
+
+
+class TaskInfoCacheTest(unittest.TestCase):
+    def test_update(self):
+        engine = SlurmEngine({})
+        a, b = ("a.run", 1), ("b.run", 1)
+        cache = engine._update_task_info_cache([(a, ("10", "PENDING")), (b, ("11", "RUNNING"))])
+        self.assertEqual(cache, {a: [("10", "PENDING")], b: [("11", "RUNNING")]})
+        b_infos = cache[b]
+
+        # task added after submitting but not yet known to squeue
+        cache[("c.run", 1)].append(("12", "PENDING"))
+        cache = engine._update_task_info_cache([(a, ("10", "RUNNING")), (b, ("11", "RUNNING"))])
+        self.assertEqual(cache, {a: [("10", "RUNNING")], b: [("11", "RUNNING")]})
+        self.assertIs(cache[b], b_infos)
+
+        cache = engine._update_task_info_cache([(b, ("11", "RUNNING"))])
+        self.assertEqual(cache, {b: [("11", "RUNNING")]})
+        self.assertEqual(engine.queue_state(), cache)
+
+    def test_submitted_after_snapshot(self):
+        engine = SlurmEngine({})
+        c = ("c.run", 1)
+        engine._task_info_cache[c].append(("12", "PENDING"))
+        engine._submitted_keys[c] = 100.0
+
+        # snapshot started before the submit, keep the entry
+        cache = engine._update_task_info_cache([], snapshot_start=99.0)
+        self.assertEqual(cache, {c: [("12", "PENDING")]})
+
+        # snapshot started after the submit, squeue is trusted again
+        cache = engine._update_task_info_cache([], snapshot_start=101.0)
+        self.assertEqual(cache, {})
+        self.assertEqual(engine._submitted_keys, {})
+
+    def test_concurrent_updates(self):
+        engine = SlurmEngine({})
+        a = ("a.run", 1)
+        engine._update_task_info_cache([(a, ("10", "PENDING"))])
+
+        class InterleavingLock:
+            """Publishes another snapshot right before the lock is acquired the first time"""
+
+            def __init__(self, lock):
+                self.lock = lock
+                self.interleave = lambda: engine._update_task_info_cache([(a, ("10", "RUNNING"))])
+
+            def __enter__(self):
+                interleave, self.interleave = self.interleave, None
+                if interleave is not None:
+                    interleave()
+                return self.lock.__enter__()
+
+            def __exit__(self, *args):
+                return self.lock.__exit__(*args)
+
+        engine._task_info_cache_lock = InterleavingLock(engine._task_info_cache_lock)
+        cache = engine._update_task_info_cache([(a, ("10", "PENDING"))])
+        self.assertEqual(cache, {a: [("10", "PENDING")]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+from sisyphus.son_of_grid_engine import parse_task_ids, SonOfGridEngine
+
+
+class ParseTaskIdsTest(unittest.TestCase):
+    def test_parse_task_ids(self):
+        self.assertEqual(parse_task_ids("3"), [3])
+        self.assertEqual(parse_task_ids("1-5:2"), [1, 3, 5])
+        self.assertEqual(parse_task_ids("1-5:2,8"), [1, 3, 5, 8])
+        self.assertEqual(parse_task_ids("2,4-6:1"), [2, 4, 5, 6])
+        self.assertEqual(parse_task_ids("undefined"), [])
+
+
+class OptionsTest(unittest.TestCase):
+    def test_cache_key_type(self):
+        engine = SonOfGridEngine({})
+        rqmt = {"mem": 1, "time": 1}
+        self.assertIn("gpu=0", engine.options(dict(rqmt, gpu=0)))
+        self.assertIn("gpu=False", engine.options(dict(rqmt, gpu=False)))
+        self.assertIn("gpu=0", engine.options(dict(rqmt, gpu=0)))
+
+
+class SubmitBatchTest(unittest.TestCase):
+    def test_timeout_not_repeated(self):
+        engine = SonOfGridEngine({}, gateway="gateway")
+        calls = []
+
+        def system_call(command, send_to_stdin=None, raw=False):
+            calls.append(command)
+            raise subprocess.TimeoutExpired(command, 30)
+
+        engine.system_call = system_call
+        runs = [(1, 3, 1), (5, 9, 2)]
+        job_ids = engine.submit_batch_helper(["run"], "log", {"mem": 1, "time": 1}, "a/b", "run", runs)
+        self.assertEqual(job_ids, [None, None])
+        self.assertEqual(len(calls), 1)
+
+
+class ReplaceLinkTest(unittest.TestCase):
+    def test_relink_same_source(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = os.path.join(tmp_dir, "src")
+            dst = os.path.join(tmp_dir, "dst")
+            with open(src, "w") as f:
+                f.write("log")
+            for link in (os.link, os.link, os.symlink, os.symlink):
+                SonOfGridEngine._replace_link(link, src, dst)
+                self.assertEqual(sorted(os.listdir(tmp_dir)), ["dst", "src"])
+            self.assertTrue(os.path.islink(dst))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
 import os
 import glob
-from sisyphus.toolkit import mktemp
+import sys
+
+import sisyphus.global_settings as gs
+from sisyphus.job_path import Path
+from sisyphus.toolkit import mktemp, compare_graph, replace_graph_objects, dump, load_file, zipped, zstandard
+
+sys.path.append(gs.TEST_DIR)
 
 
 class MkTemp(unittest.TestCase):
@@ -23,5 +29,129 @@ class MkTemp(unittest.TestCase):
         assert len(glob.glob(temp)) == 0
 
 
+class Dump(unittest.TestCase):
+    def check_dump(self, compression):
+        obj = {"a": [1, 2.5, "text"], "b": ("x", None)}
+        with mktemp() as temp:
+            old_compression = gs.DUMP_COMPRESSION
+            gs.DUMP_COMPRESSION = compression
+            try:
+                dump(obj, temp)
+            finally:
+                gs.DUMP_COMPRESSION = old_compression
+            self.assertEqual(load_file(temp), obj)
+            return zipped(temp)
+
+    def test_gzip(self):
+        self.assertTrue(self.check_dump("gzip"))
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        self.assertFalse(self.check_dump("zstd"))
+
+
+class CompareGraph(unittest.TestCase):
+    def test_compare_leaves(self):
+        self.assertEqual(list(compare_graph(["a", "a", 1], ["a", "a", 1])), [])
+        diff = list(compare_graph(["a", "a", 1], ["a", "b", 1.0]))
+        self.assertEqual(len(diff), 2)
+        self.assertEqual(diff[0][-1], ("a", "b"))
+        self.assertEqual(diff[1][-1], (int, float))
+
+    def test_compare_slots(self):
+        class Base:
+            __slots__ = ("value",)
+
+        class Node(Base):
+            __slots__ = ("other",)
+
+        node1, node2 = Node(), Node()
+        node1.value, node2.value = "a", "b"
+        node1.other = "c"
+        self.assertEqual([d[-1] for d in compare_graph(node1, node2)], [("a", "b"), ("other", None)])
+
+
+class ReplaceGraphObjects(unittest.TestCase):
+    def test_replace_input(self):
+        from recipe.task import test
+
+        job1 = test.Test(text=Path("input_text1.gz"))
+        job2 = test.Test(text=Path("input_text2.gz"))
+        merge = test.MergeInputs([job1.out, job2.out, job1.out])
+        replaced = replace_graph_objects(merge, mapping=[(Path("input_text1.gz"), Path("other_text.gz"))])
+
+        job1_new = test.Test(text=Path("other_text.gz"))
+        self.assertIs(replaced, test.MergeInputs([job1_new.out, job2.out, job1_new.out]))
+        self.assertEqual(list(compare_graph(merge, merge)), [])
+        self.assertIs(replace_graph_objects(merge, mapping=[(Path("unused.gz"), Path("other_text.gz"))]), merge)
+        self.assertEqual([t[-1] for t in compare_graph(merge, replaced)], [("input_text1.gz", "other_text.gz")])
+
+    def test_replace_cycle(self):
+        class Node:
+            pass
+
+        node = Node()
+        node.value = "a"
+        node.self = node
+        replaced = replace_graph_objects([node, node], mapping=[("a", "b")])
+        self.assertIs(replaced[0], replaced[1])
+        self.assertEqual(replaced[0].value, "b")
+        self.assertIs(node.value, "a")
+
+    def test_replace_deep(self):
+        depth = sys.getrecursionlimit() + 100
+        current = "a"
+        for _ in range(depth):
+            current = [current]
+        replaced = replace_graph_objects(current, mapping=[("a", "b")])
+        self.assertEqual([d[-1] for d in compare_graph(current, replaced)], [("a", "b")])
+        for _ in range(depth):
+            replaced = replaced[0]
+        self.assertEqual(replaced, "b")
+
+    def test_replace_containers(self):
+        import collections
+
+        Pair = collections.namedtuple("Pair", ["first", "second"])
+        current = [("a", "c"), {"a"}, frozenset(["a"]), Pair("a", "c"), {"key": "a"}]
+        replaced = replace_graph_objects(current, mapping=[("a", "b")])
+        self.assertEqual(replaced, [("b", "c"), {"b"}, frozenset(["b"]), Pair("b", "c"), {"key": "b"}])
+        self.assertIs(type(replaced[3]), Pair)
+        self.assertEqual(current[0], ("a", "c"))
+
+        current = collections.defaultdict(list, {"key": "a", "other": "c"})
+        replaced = replace_graph_objects(current, mapping=[("a", "b")])
+        self.assertIs(type(replaced), collections.defaultdict)
+        self.assertIs(replaced.default_factory, list)
+        self.assertEqual(replaced, {"key": "b", "other": "c"})
+
+    def test_replace_slots(self):
+        class Base:
+            __slots__ = ("value",)
+
+        class Node(Base):
+            __slots__ = ("other", "unset")
+
+        node = Node()
+        node.value = "a"
+        node.other = ["a", "c"]
+        self.assertIs(replace_graph_objects(node, mapping=[("b", "c")]), node)
+        replaced = replace_graph_objects(node, mapping=[("a", "b")])
+        self.assertIsNot(replaced, node)
+        self.assertEqual(replaced.value, "b")
+        self.assertEqual(replaced.other, ["b", "c"])
+        self.assertFalse(hasattr(replaced, "unset"))
+        self.assertEqual(node.value, "a")
+
+        class DictNode(Base):
+            pass
+
+        node = DictNode()
+        node.value = "a"
+        node.other = "a"
+        replaced = replace_graph_objects(node, mapping=[("a", "b")])
+        self.assertEqual((replaced.value, replaced.other), ("b", "b"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,7 +7,7 @@ import unittest
 import collections
 
 from sisyphus import job_path
-from sisyphus.tools import execute_in_dir, cache_result, sis_hash, hardlink_or_copy
+from sisyphus.tools import execute_in_dir, cache_result, sis_hash, hardlink_or_copy, file_mtime
 from sisyphus.hash import sis_hash_helper
 import sisyphus.global_settings as gs
 
@@ -126,6 +126,15 @@ class HardCopy(unittest.TestCase):
         shutil.rmtree(dst)
 
 
+class FileMtime(unittest.TestCase):
+    def test_file_mtime(self):
+        path = "%s/recipe/task/test.py" % gs.TEST_DIR
+        self.assertEqual(file_mtime(path), os.stat(path).st_mtime)
+        self.assertIsNone(file_mtime("%s/recipe" % gs.TEST_DIR))
+        self.assertIsNone(file_mtime("%s/does_not_exist" % gs.TEST_DIR))
+        self.assertIsNone(file_mtime("%s/sub_dir" % path))
+
+
 def test_extract_paths_functools_partial():
     from sisyphus.tools import extract_paths
     from functools import partial